@@ -84,9 +84,9 @@
 #
 # Easy-to-find and easy-to-edit in-code configuration through the use of a namespace-only "config" class in main.
 # This hack works well as a way to have infrequently-changing global configuration information directly in your code.
-# Since configuration-in-code will not suit all needs, an upcoming version of appbootstrap is going to offer a clean
-# and simple file-based configuration strategy which will be handled all in the Base class. This will further minimize
-# the amount of stuff we are doing in __main__ and of course offer separation of code from configuration.
+# Since configuration-in-code will not suit all needs, an INI or JSON config file given with --config can override it.
+# Loading, validating, caching and hot-reloading of the config file is all handled in the Base class, which keeps
+# __main__ small and offers separation of code from configuration.
 #
 # Care has been taken to follow best practices in as many areas as possible. Best-practices known in the Python
 # community as well as best practices learned from nearly 20 years writing code and building infrastructure for the
@@ -120,12 +120,18 @@
 
 
 import logging
-import argparse
 import time
+import sys
+import os
+import signal
+import threading
+
+# Startup time matters for tools which are run very frequently, such as from cron or from hooks. Modules which are
+# expensive to import and only needed on some code paths are imported where they are used instead of up here:
+# argparse in build_cmd_line_parser() and multiprocessing in the Dispatcher. Python caches imported modules, so these
+# local imports cost nothing after the first one. Use benchstartup.py to measure the effect of any imports you add.
 
 # Other essential core modules you may want to use early in your new application:
-# import sys
-# import os
 # import io
 # import re
 
@@ -172,6 +178,49 @@ config.default_log_level = logging.INFO
 # of the log actions. You will see WARN, ERROR and CRITICAL messages in either INFO or DEBUG log_levels. We have not
 # limited the message types/levels. We have only limited the selection of log level to a single --verbose switch.
 
+# Work dispatch. App.run() hands independent work items to a Dispatcher which fans them out to a pool of workers.
+# The --workers and --executor command-line options override the first two values. A value of 0 workers means one
+# worker per CPU core.
+config.default_workers = 0
+config.default_executor = "thread"  # "thread" for I/O-bound work, "process" for CPU-bound work (avoids the GIL).
+
+# Maximum number of submitted-but-unfinished work items per worker. This bounds the memory used by queued items and
+# results, no matter how many items the application feeds in. 2 keeps every worker busy without queueing up much work.
+config.in_flight_per_worker = 2
+
+# Minimum number of seconds between progress log lines while work is being dispatched.
+config.progress_interval = 5.0
+
+# Number of items dispatched by the example operation in App.run(). Remove this once you dispatch your own work.
+config.example_item_count = 100
+
+# File-based configuration. A config file, given with --config or set here, overrides the in-code values above. Only
+# the settings named in config.file_schema may appear in the file and each is converted to and checked against the
+# type given there. INI files put the settings in a section named after config.app_nick, for example:
+#
+#     [appbootstrap]
+#     default_workers = 8
+#     default_executor = process
+#
+# JSON files hold a single object, for example: {"default_workers": 8, "default_executor": "process"}
+config.config_file = None  # None means no config file unless one is given with --config.
+
+config.file_schema = {
+    "default_workers": int,
+    "default_executor": str,
+    "in_flight_per_worker": int,
+    "progress_interval": float,
+    "example_item_count": int,
+}
+
+# The validated settings are cached in this file along with a hash of the config file they came from. When the config
+# file has not changed, later runs take the settings from the cache instead of parsing and validating the file again.
+config.config_cache_file = config.log_path + "/." + config.app_nick + "-config-cache.json"
+
+# Long-running applications call reload_config_if_changed() regularly (the Dispatcher does so while it works) and pick
+# up changes to the config file without a restart. This is the minimum number of seconds between checks of the file.
+config.config_check_interval = 2.0
+
 
 #################################################  CLASS DEFINITIONS  ##################################################
 
@@ -186,14 +235,21 @@ class Base(object):
     tendency to try to move anything in main to Base if possible, but not to an unreasonable degree.
     A bit more about main; Some things are very convenient to have in the main/global space, such as the config
     namespace we use as a clear, self-documenting place to edit infrequently-changing configuration information in
-    appbootstrap. In future versions of the appbootstrap template, config might be handled in some other way, perhaps
-    through loading a config file, entirely in the Base class and not involving the main namespace, but having config
-    as a simple namespace in main near the top of the code is clean and convenient for now.
+    appbootstrap. Base can also load a config file over the in-code config (see load_config_file()), so the config
+    namespace in main holds the defaults and the config file holds what changes from one installation to another.
     Base should be inherited by all classes in appbootstrap unless the class is so simple that it does not need
     access to logging or configuration data but since it is a good idea to have a LOT of ability to log information
     especially at the verbose/DEBUG level, then I can say that really ALL classes should inherit from Base or from
     another class which is a subclass of Base."""
 
+    # State of the loaded config file. These are class attributes because the config namespace they apply to is
+    # shared by all instances, so any object can check for and reload a changed config file.
+    config_file_path = None
+    config_file_stat = None
+    config_file_hash = None
+    config_file_checked = 0.0
+    config_defaults = None
+
     def __init__(self, config, logger):
         """Base is never instantiated. It is always inherited. However, this constructor is definitely used. Classes
         which inherit from Base will in most cases use python's super() call to invoke Base.__init__() in order to
@@ -206,6 +262,160 @@ class Base(object):
         # to DEBUG in the code. Command-line options have not been processed yet so --verbose cannot take effect yet.
         self.log.debug("Base class __init__ executed.")
 
+    def load_config_file(self, path):
+        """Loads the INI or JSON config file at path (JSON if the name ends in .json) and applies its settings to the
+        config namespace. The validated settings are cached along with the hash of the file, so while the file is
+        unchanged its settings come from the cache without parsing or validating the file again. Raises ValueError
+        with a message for the user if the file cannot be read or does not match config.file_schema."""
+        import hashlib
+
+        try:
+            stat = os.stat(path)
+            with open(path, "rb") as config_file:
+                raw = config_file.read()
+        except (IOError, OSError) as e:
+            raise ValueError("Cannot read config file " + path + ": " + str(e))
+
+        # The schema is part of the hash so that changing config.file_schema in the code invalidates the cache.
+        digest = hashlib.sha1(raw + repr(sorted((k, t.__name__) for k, t in self.cfg.file_schema.items()))
+                              .encode("utf-8")).hexdigest()
+
+        # The values are checked on every load, from the cache or not, and on a reload as well as at startup, so that
+        # a reload never puts a value in effect which the first load would have rejected.
+        values = self.read_config_cache(digest)
+        if values is None:
+            self.log.debug("Parsing and validating config file " + path)
+            values = self.compile_config(path, raw)
+            self.check_config_values(path, values)
+            self.write_config_cache(digest, values)
+        else:
+            self.log.debug("Config file " + path + " is unchanged. Using cached settings.")
+            self.check_config_values(path, values)
+
+        # The in-code values are remembered on the first load, so that a setting which is later removed from the
+        # config file goes back to its in-code value when the file is reloaded.
+        if Base.config_defaults is None:
+            Base.config_defaults = dict((name, getattr(self.cfg, name, None)) for name in self.cfg.file_schema)
+        for name, default in Base.config_defaults.items():
+            setattr(self.cfg, name, values.get(name, default))
+
+        Base.config_file_path = path
+        Base.config_file_stat = (stat.st_mtime, stat.st_size)
+        Base.config_file_hash = digest
+        Base.config_file_checked = time.time()
+        self.log.info("Loaded " + str(len(values)) + " setting(s) from config file " + path)
+
+    def compile_config(self, path, raw):
+        """Parses the raw contents of a config file and returns a dict of its settings, each converted to the type
+        given in config.file_schema."""
+        text = raw.decode("utf-8")
+        if path.lower().endswith(".json"):
+            import json
+            try:
+                settings = json.loads(text)
+            except ValueError as e:
+                raise ValueError("Config file " + path + " is not valid JSON: " + str(e))
+            if not isinstance(settings, dict):
+                raise ValueError("Config file " + path + " must hold a single JSON object.")
+        else:
+            try:
+                import configparser
+            except ImportError:  # Python 2
+                import ConfigParser as configparser
+            parser = configparser.RawConfigParser()
+            try:
+                if hasattr(parser, "read_string"):
+                    parser.read_string(text, path)
+                else:  # Python 2
+                    import StringIO
+                    parser.readfp(StringIO.StringIO(text), path)
+            except configparser.Error as e:
+                raise ValueError("Config file " + path + " is not valid INI: " + str(e))
+            if not parser.has_section(self.cfg.app_nick):
+                raise ValueError("Config file " + path + " has no [" + self.cfg.app_nick + "] section.")
+            settings = dict(parser.items(self.cfg.app_nick))
+
+        values = {}
+        for name, value in settings.items():
+            if name not in self.cfg.file_schema:
+                raise ValueError("Config file " + path + " has an unknown setting: " + name)
+            wanted = self.cfg.file_schema[name]
+            try:
+                if isinstance(value, bool) and wanted is not bool:
+                    raise ValueError("true/false is not a valid " + wanted.__name__)
+                if wanted is bool and not isinstance(value, bool):
+                    value = {"true": True, "yes": True, "1": True,
+                             "false": False, "no": False, "0": False}[str(value).lower()]
+                elif wanted is int and isinstance(value, float) and not value.is_integer():
+                    raise ValueError("not a whole number")
+                values[name] = wanted(value)
+            except (ValueError, TypeError, KeyError) as e:
+                raise ValueError("Config file " + path + " setting " + name + " = " + repr(value) +
+                                 " is not a valid " + wanted.__name__ + " (" + str(e) + ")")
+        return values
+
+    def check_config_values(self, path, values):
+        """Checks the values of the settings which the rest of the application relies on, beyond their type. Raises
+        ValueError with a message for the user."""
+        if values.get("default_executor", "thread") not in ("thread", "process"):
+            raise ValueError("Config file " + path + " setting default_executor must be thread or process, not " +
+                             repr(values["default_executor"]) + ".")
+        if values.get("default_workers", 0) < 0:
+            raise ValueError("Config file " + path + " setting default_workers must be 0 (one worker per CPU core) or "
+                             "a positive integer.")
+        if values.get("in_flight_per_worker", 1) < 1:
+            raise ValueError("Config file " + path + " setting in_flight_per_worker must be at least 1.")
+
+    def read_config_cache(self, digest):
+        """Returns the cached settings for the config file with the given hash, or None on a cache miss. A cache file
+        which cannot be read or does not hold what write_config_cache() writes is a miss too."""
+        import json
+        try:
+            with open(self.cfg.config_cache_file) as cache_file:
+                cache = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return None
+        if not isinstance(cache, dict) or cache.get("hash") != digest:
+            return None
+        values = cache.get("values")
+        return values if isinstance(values, dict) else None
+
+    def write_config_cache(self, digest, values):
+        import json
+        try:
+            with open(self.cfg.config_cache_file, "w") as cache_file:
+                json.dump({"hash": digest, "values": values}, cache_file)
+        except (IOError, OSError) as e:  # The cache is only an optimization, so this is not an error.
+            self.log.debug("Config cache not written: " + str(e))
+
+    def reload_config_if_changed(self):
+        """Reloads the config file if it has changed since it was loaded and returns True if it did. Cheap enough to
+        call often: the file is only looked at every config.config_check_interval seconds and only read and hashed
+        when its modification time or size has changed. Nothing else is reset by a reload, so caches, connections and
+        other state built up by a long-running application are kept. If the changed file is invalid, the error is
+        logged and the settings loaded before stay in effect."""
+        now = time.time()
+        if Base.config_file_path is None or now - Base.config_file_checked < self.cfg.config_check_interval:
+            return False
+        Base.config_file_checked = now
+
+        try:
+            stat = os.stat(Base.config_file_path)
+        except OSError as e:
+            self.log.warning("Cannot check config file " + Base.config_file_path + ": " + str(e))
+            return False
+        if (stat.st_mtime, stat.st_size) == Base.config_file_stat:
+            return False
+
+        previous_hash = Base.config_file_hash
+        try:
+            self.load_config_file(Base.config_file_path)
+        except ValueError as e:
+            self.log.error(str(e) + " Keeping the settings loaded before.")
+            Base.config_file_stat = (stat.st_mtime, stat.st_size)  # Do not report the same broken file again.
+            return False
+        return Base.config_file_hash != previous_hash
+
 
 class App(Base):
     """The App class is the central point of activity for this application. There should be only one instance of the App
@@ -245,15 +455,224 @@ class App(Base):
         else:
             self.log.info("Using default log level of " + logging.getLevelName(self.cfg.default_log_level))
 
+        # The config file is loaded before any other option is looked at, since it may change their defaults. Values
+        # given on the command line take precedence over the config file, which takes precedence over the code.
+        config_file = self.arg.config or self.cfg.config_file
+        if config_file:
+            try:
+                self.load_config_file(config_file)
+            except ValueError as e:
+                self.log.error(str(e))
+                sys.exit(1)
+
+        if self.arg.workers is None:
+            self.arg.workers = self.cfg.default_workers
+        if self.arg.executor is None:
+            self.arg.executor = self.cfg.default_executor
+        if self.arg.executor not in ("thread", "process"):
+            self.log.error("The executor must be thread or process, not " + repr(self.arg.executor) + ".")
+            sys.exit(1)
+
+        if self.arg.workers < 0:
+            self.log.error("The --workers value must be 0 (one worker per CPU core) or a positive integer.")
+            sys.exit(1)
+        if self.arg.workers == 0:
+            import multiprocessing
+            self.arg.workers = multiprocessing.cpu_count()
+        self.log.debug("Dispatching with " + str(self.arg.workers) + " " + self.arg.executor + " worker(s).")
+
     def run(self):
         self.log.info("Application " + self.cfg.app_nick + " is now running.")
 
         #### DISPATCH USER-REQUESTED, APPLICATION-SPECIFIC OPERATIONS FROM HERE in run() ####
 
+        # Operations which break down into many independent work items (files to load, records to convert, widgets
+        # to dump) should be handed to a Dispatcher rather than looped over here. The Dispatcher fans the items out
+        # to the pool selected with --workers and --executor and hands back the results and errors. Replace the
+        # example task and items below with your own.
+        dispatcher = Dispatcher(self.cfg, self.log, self.arg.workers, self.arg.executor)
+        results, errors = dispatcher.dispatch(example_task, range(self.cfg.example_item_count))
+
+        for item, error in errors:
+            self.log.error("Work item " + repr(item) + " failed: " + error)
+
+        # The returned value becomes the process exit status. See main().
+        return 1 if errors or dispatcher.stop_requested else 0
+
+
+class Dispatcher(Base):
+    """The Dispatcher runs a task function over many work items using a pool of worker threads or worker processes.
+    Threads are the right choice for I/O-bound work (network, disk, subprocesses) and processes are the right choice
+    for CPU-bound work, since each process has its own interpreter and is not held back by the GIL. With the process
+    executor, the task function must be defined at the top level of the module and the items and results must be
+    picklable, because they are sent between processes.
+    Items are submitted lazily, so an iterator or generator of any length can be dispatched. At most workers *
+    config.in_flight_per_worker items are submitted-but-unfinished at any one time, which bounds memory use. Results
+    and errors are collected as items complete, progress is logged every config.progress_interval seconds and SIGINT
+    (Ctrl-C) or SIGTERM stop the dispatch gracefully: no new items are submitted, the items already submitted are
+    allowed to finish and their results are kept. A second signal terminates the workers immediately."""
+
+    def __init__(self, config, logger, workers, executor):
+        super(Dispatcher, self).__init__(config, logger)
+        self.workers = workers
+        self.executor = executor
+        self.max_in_flight = workers * config.in_flight_per_worker  # Fixed for the dispatch, even if config reloads.
+        self.stop_requested = False
+        self.in_flight = 0
+        self.done_count = 0
+        self.results = []
+        self.errors = []
+        self.unreported = []  # Python 2 only: (item, AsyncResult) pairs, see sweep_failed().
+        # Completion callbacks run in a thread owned by the pool, so shared counters are guarded by this condition.
+        self.condition = threading.Condition()
+
+    def create_pool(self):
+        import multiprocessing.pool  # Also imports multiprocessing. See PYTHON CORE LIBRARIES above.
+        if self.executor == "process":
+            return multiprocessing.Pool(self.workers, initializer=ignore_sigint)
+        return multiprocessing.pool.ThreadPool(self.workers)
+
+    def handle_signal(self, signum, frame):
+        if self.stop_requested:
+            self.log.warning("Signal " + str(signum) + " received again. Terminating workers now.")
+            raise KeyboardInterrupt
+        self.log.warning("Signal " + str(signum) + " received. Finishing in-flight work items, then stopping.")
+        self.stop_requested = True
+
+    def item_done(self, outcome):
+        """Pool callback, called once for each completed work item with the (item, ok, value) tuple returned by
+        dispatch_call()."""
+        item, ok, value = outcome
+        with self.condition:
+            if ok:
+                self.results.append((item, value))
+            else:
+                self.errors.append((item, value))
+            self.in_flight -= 1
+            self.done_count += 1
+            self.condition.notify()
+
+    def sweep_failed(self):
+        """Python 2 has no error_callback, so a failure outside of the task itself, such as an unpicklable result
+        under --executor process, never reaches item_done() and would leave its in-flight slot taken forever. The
+        AsyncResults are kept instead and the failed ones are reported here. Called with self.condition held."""
+        pending = []
+        for item, async_result in self.unreported:
+            if not async_result.ready():
+                pending.append((item, async_result))
+            elif not async_result.successful():
+                try:
+                    async_result.get(0)
+                    error = "unknown pool error"
+                except Exception as e:
+                    error = repr(e)
+                self.errors.append((item, error))
+                self.in_flight -= 1
+                self.done_count += 1
+        self.unreported = pending
+
+    def log_progress(self, total):
+        of_total = " of " + str(total) if total is not None else ""
+        self.log.info("Progress: " + str(self.done_count) + of_total + " work items done, " +
+                      str(len(self.errors)) + " error(s), " + str(self.in_flight) + " in flight.")
+
+    def dispatch(self, task, items, total=None):
+        """Run task(item) for every item in items and return a (results, errors) tuple of lists. results holds
+        (item, return_value) tuples and errors holds (item, error_message) tuples, both in order of completion.
+        total is only used for progress reporting and is taken from len(items) when items has a length."""
+        if total is None and hasattr(items, "__len__"):
+            total = len(items)
+
+        self.log.info("Dispatching work items to " + str(self.workers) + " " + self.executor + " worker(s).")
+        start_time = time.time()
+        last_progress_time = start_time
+
+        previous_handlers = {}
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            previous_handlers[signum] = signal.signal(signum, self.handle_signal)
+
+        pool = self.create_pool()
+        try:
+            for item in items:
+                with self.condition:
+                    # Wait for a free in-flight slot. The timeout keeps the main thread responsive to signals.
+                    while self.in_flight >= self.max_in_flight and not self.stop_requested:
+                        self.condition.wait(0.2)
+                        self.sweep_failed()
+                    if self.stop_requested:
+                        break
+                    self.in_flight += 1
+                if sys.version_info[0] >= 3:
+                    # Python 3 also reports failures outside of the task itself, such as an unpicklable result.
+                    pool.apply_async(dispatch_call, (task, item), callback=self.item_done,
+                                     error_callback=lambda e, item=item: self.item_done((item, False, repr(e))))
+                else:
+                    async_result = pool.apply_async(dispatch_call, (task, item), callback=self.item_done)
+                    with self.condition:
+                        self.unreported.append((item, async_result))
+                        self.sweep_failed()  # Also drops the finished ones, so the list stays short.
+
+                if time.time() - last_progress_time >= self.cfg.progress_interval:
+                    self.log_progress(total)
+                    last_progress_time = time.time()
+                    self.reload_config_if_changed()
+
+            with self.condition:
+                while self.in_flight > 0:
+                    self.condition.wait(0.2)
+                    self.sweep_failed()
+                    if time.time() - last_progress_time >= self.cfg.progress_interval:
+                        self.log_progress(total)
+                        last_progress_time = time.time()
+
+            pool.close()
+        except KeyboardInterrupt:
+            pool.terminate()
+            self.stop_requested = True
+        finally:
+            pool.join()
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+
+        self.log_progress(total)
+        self.log.info("Dispatch " + ("stopped" if self.stop_requested else "completed") + " in " +
+                      "%.3f" % (time.time() - start_time) + " seconds.")
+
+        return self.results, self.errors
+
 
 #### ADD YOUR APPLICATION-SPECIFIC CLASS DEFINITIONS HERE ####
 
 
+####################################################  TASK FUNCTIONS  ##################################################
+
+
+def dispatch_call(task, item):
+    """Runs in a worker thread or worker process. Calls task(item) and returns an (item, ok, value) tuple where value
+    is the return value of the task or, if it raised, a short error message. Exceptions are turned into messages here
+    because not every exception can be pickled back from a worker process and because one failing item must not stop
+    the others."""
+    try:
+        return item, True, task(item)
+    except Exception as e:
+        return item, False, type(e).__name__ + ": " + str(e)
+
+
+def ignore_sigint():
+    """Initializer for worker processes. Ctrl-C is delivered to every process in the foreground process group, so
+    worker processes ignore it and leave the graceful shutdown to the Dispatcher in the main process."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def example_task(item):
+    """An example task function for the Dispatcher. Task functions take a single work item and return a result. For
+    the process executor they must be defined here at the top level of the module so that they can be pickled."""
+    return item * item
+
+
+#### ADD YOUR APPLICATION-SPECIFIC TASK FUNCTIONS HERE ####
+
+
 ########################################################  MAIN  ########################################################
 
 
@@ -263,8 +682,8 @@ def main():
     Specific non-zero values will depend on your application, your environment and how you choose to implement such
     conventions, perform error trapping, etc. 0 for success is mandatory. Non-zero values are up to you. main()
     initializes the global logger and starts this application with App.run(). When the program is almost done operating,
-    the last part of main() can then perform any finalization and cleanup prior to exit. This application does not
-    currently support importing as a module, although it could with some minimal changes."""
+    the last part of main() can then perform any finalization and cleanup prior to exit. Importing this file as a module
+    does not call main(), so its classes and functions can be reused by other programs, tests and benchmarks."""
 
     root_logger_name = config.app_nick + "-main"
 
@@ -280,13 +699,13 @@ def main():
     logger.info("- - - - - - - - - - Initializing " + config.app_nick + " " + start_time_human)
     logger.info("Instantiated root logger: " + root_logger_name)
 
-    app = App(config, logger, cmd_line_parser)
-    app.run()
+    app = App(config, logger, build_cmd_line_parser())
+    status = app.run()
 
-    return 0
+    return status
 
 
-################################################  MAIN EXECUTION BEGINS  ###############################################
+#############################################  COMMAND-LINE OPTIONS  ###################################################
 
 
 #### ARGPARSE COMMAND-LINE OPTIONS AND HELP CONFIGURATION ####
@@ -319,26 +738,26 @@ def main():
 # Read below about full-width-wrapping vs. fixed-formatting limited to 80 chars.
 ################################################################################
 
-cmd_line_parser = argparse.ArgumentParser(
-    description="""This is the program description shown when the --help or -h command-line options are invoked. """
-                """Notice how triple-double quotes are used here and also notice how the first part of this """
-                """description has opening and closing quotes on each line with included space characters after """
-                """the last word on each line. The lower part of this description needs to use fixed-formatting """
-                """because we are using indentation and blank lines to highlight some important commands for our """
-                """program. It is this fixed-formatting part at the end which requires us to use triple-double """
-                """quotes in this manner for the entire description. Since we don't need the fixed-formatting """
-                """for the first part of the description and we do want the lines to wrap, that is why we also have """
-                """closing quotes up here. In the lower part, we must continue using the same kind of quotes """
-                """because this entire description is a single attribute and we cannot mix quote types here. """
-                """If you do not need any fancy fixed-formatting in your description then you can simplify the """
-                """quoting, but helping the reader with formatting and thorough help text can be worth the """
-                """effort. The triple quotes mean we do not have to escape apostrophes or newlines and it also """
-                """means we can easily read and edit our own fixed formatting here in the code itself. So this part """
-                """of the description text will wrap at the full console width where it is displayed, but the below """
-                """fixed-formatting part we will hard-wrap at no more than 80 characters. The PEP8 coding standards """
-                """being followed in this python code means our code line width is no more than 120 characters, but """
-                """the maximum width of fixed-formatted help text should not exceed 80 characters and this is the """
-                """standard you will see in most if not all unix/linux command help displayed in a console.
+CMD_LINE_DESCRIPTION = (
+    """This is the program description shown when the --help or -h command-line options are invoked. """
+    """Notice how triple-double quotes are used here and also notice how the first part of this """
+    """description has opening and closing quotes on each line with included space characters after """
+    """the last word on each line. The lower part of this description needs to use fixed-formatting """
+    """because we are using indentation and blank lines to highlight some important commands for our """
+    """program. It is this fixed-formatting part at the end which requires us to use triple-double """
+    """quotes in this manner for the entire description. Since we don't need the fixed-formatting """
+    """for the first part of the description and we do want the lines to wrap, that is why we also have """
+    """closing quotes up here. In the lower part, we must continue using the same kind of quotes """
+    """because this entire description is a single attribute and we cannot mix quote types here. """
+    """If you do not need any fancy fixed-formatting in your description then you can simplify the """
+    """quoting, but helping the reader with formatting and thorough help text can be worth the """
+    """effort. The triple quotes mean we do not have to escape apostrophes or newlines and it also """
+    """means we can easily read and edit our own fixed formatting here in the code itself. So this part """
+    """of the description text will wrap at the full console width where it is displayed, but the below """
+    """fixed-formatting part we will hard-wrap at no more than 80 characters. The PEP8 coding standards """
+    """being followed in this python code means our code line width is no more than 120 characters, but """
+    """the maximum width of fixed-formatted help text should not exceed 80 characters and this is the """
+    """standard you will see in most if not all unix/linux command help displayed in a console.
 
             Now we are in the section which drives the use of the triple-quotes.
             Note that an 80-character-line ends -------------here------------->|
@@ -379,21 +798,61 @@ cmd_line_parser = argparse.ArgumentParser(
                 save = Save all doo-dads.
 
                 dump = Serialize all widgets into separate xml files.
-            """,
-    formatter_class=argparse.RawDescriptionHelpFormatter,
-    add_help=True)
+            """)
+
+
+def build_cmd_line_parser():
+    """Builds and returns the argparse parser for the command-line options. This is called by main() only when the
+    program is actually run, not when this file is imported as a module. Keeping the parser construction (and the
+    import of argparse) out of import time means importing is cheap and a run only pays for what it really uses."""
+    import argparse  # Imported here rather than at the top of the file. See PYTHON CORE LIBRARIES above.
+
+    cmd_line_parser = argparse.ArgumentParser(
+        description=CMD_LINE_DESCRIPTION,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        add_help=True)
+
+    cmd_line_parser.add_argument(
+        '--verbose',
+        action='store_true',
+        help='Include a high level of detail in the log and in any output to the user. This option changes the log'
+             ' level from INFO to DEBUG. The specific types of information which will be added and whether it is added'
+             ' just to the log or also to user output will depend on the application. Customize this text to your'
+             ' application.')
+
+    cmd_line_parser.add_argument(
+        '--config',
+        action='store',
+        help='Path of an INI or JSON config file (JSON if the name ends in .json) whose settings override the'
+             ' in-code configuration. Options given on the command line override the config file.')
+
+    # The --workers and --executor defaults are None so that process_cmd_line() can tell whether they were given and
+    # otherwise take them from the configuration, which may have been changed by a config file.
+    cmd_line_parser.add_argument(
+        '--workers',
+        action='store',
+        type=int,
+        help='Number of workers the Dispatcher uses to process work items in parallel. 0 starts one worker per CPU'
+             ' core. Integer. Default: ' + str(config.default_workers) + ' (config.default_workers).')
+
+    cmd_line_parser.add_argument(
+        '--executor',
+        action='store',
+        choices=['thread', 'process'],
+        help='Kind of worker used by the Dispatcher. Use thread for I/O-bound work such as network or disk access and'
+             ' process for CPU-bound work, which then runs on multiple cores. Default: ' + config.default_executor +
+             ' (config.default_executor).')
+
+    # Command-line parsing has now been configured and we can start initializing and then running the application.
+    return cmd_line_parser
+
 
-cmd_line_parser.add_argument(
-    '--verbose',
-    action='store_true',
-    help='Include a high level of detail in the log and in any output to the user. This option changes the log level'
-         ' from INFO to DEBUG. The specific types of information which will be added and whether it is added just to'
-         ' the log or also to user output will depend on the application. Customize this text to your application.')
+################################################  MAIN EXECUTION BEGINS  ###############################################
 
-# Command-line parsing has now been configured and we can start initializing and then running the application.
 
-status = main()  # Start program execution.
-exit(status)  # Program execution ends, returning the integer returned by main to the shell as the process exit status.
+# main() is only called when this file is run as a program, never when it is imported as a module.
+if __name__ == '__main__':
+    sys.exit(main())  # Returns the integer returned by main to the shell as the process exit status.
 
 
 ##
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+########################################################################################################################
+
+#
+# benchstartup.py
+# ---------------
+#
+#    Startup-time benchmark for appbootstrap.py (or any program built from it, see --script).
+#
+#    Tools built from appbootstrap are often run thousands of times a day from cron, hooks and other scripts, so the
+#    time it takes the program to start matters as much as the time it takes to do its work. This benchmark reports:
+#
+#    # Wall-clock time of a bare interpreter start, of importing the program as a module and of running it with --help
+#    # The overhead of the program above the bare interpreter start, checked against a target
+#    # The most expensive imports, from the interpreter's own -X importtime report (Python 3.7 and later)
+#
+#    Usage: python3 benchstartup.py [--script appbootstrap.py] [--runs 20] [--target-ms 50]
+#    The exit status is 0 when the median --help overhead is within the target and 1 when it is not.
+#
+
+########################################################################################################################
+
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+# Target for the cold-start overhead of a run, in milliseconds above a bare interpreter start. The bare interpreter
+# start itself depends on the machine and the Python build and is outside of the program's control.
+TARGET_OVERHEAD_MS = 50.0
+
+# Number of entries shown from the -X importtime report.
+TOP_IMPORTS = 10
+
+
+def time_command(cmd, cwd, env, runs):
+    """Runs cmd the given number of times and returns the list of wall-clock times in milliseconds. The first run is
+    made once beforehand and not counted, so that compiling the .pyc files does not skew the results."""
+    subprocess.run(cmd, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return timings
+
+
+def top_imports(module, cwd, env):
+    """Returns (cumulative_us, name) tuples for the most expensive imports made directly by module, as reported by
+    python -X importtime. Imports nested deeper are counted in the cumulative time of the direct import."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module],
+                          cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    # Nested imports are listed before the import which made them, indented by two more spaces per level.
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = len(name) - len(name.lstrip())
+        if depth == 1:  # A top-level import. Keep its direct imports only if it is the module being measured.
+            if name.strip() == module:
+                break
+            entries = []
+        elif depth == 3:
+            entries.append((int(cumulative), name.strip()))
+    entries.sort(reverse=True)
+    return entries[:TOP_IMPORTS]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the startup time of an appbootstrap-based program.")
+    parser.add_argument('--script', default="appbootstrap.py",
+                        help='Program to measure, relative to the directory of this benchmark. Default: appbootstrap.py')
+    parser.add_argument('--runs', type=int, default=20, help='Number of timed runs per measurement. Default: 20')
+    parser.add_argument('--target-ms', type=float, default=TARGET_OVERHEAD_MS,
+                        help='Allowed median --help overhead above a bare interpreter start, in milliseconds.'
+                             ' Default: %(default)s')
+    arg = parser.parse_args()
+
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    script_path = os.path.join(source_dir, arg.script)
+    module = os.path.splitext(os.path.basename(arg.script))[0]
+    # The runs happen in a scratch directory, so the log file the program creates at startup does not land in the
+    # source tree. The module is found through PYTHONPATH instead: the script's own directory first.
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(script_path), source_dir,
+                                                                     os.environ.get("PYTHONPATH")])))
+    with tempfile.TemporaryDirectory(prefix="benchstartup-") as cwd:
+        return run_benchmark(arg, module, script_path, cwd, env)
+
+
+def run_benchmark(arg, module, script_path, cwd, env):
+    measurements = [
+        ("bare interpreter", [sys.executable, "-c", "pass"]),
+        ("import " + module, [sys.executable, "-c", "import " + module]),
+        (arg.script + " --help", [sys.executable, script_path, "--help"]),
+    ]
+
+    print("Wall-clock startup times over {} runs (milliseconds):".format(arg.runs))
+    print("{:<32} {:>8} {:>8} {:>8}".format("", "min", "median", "max"))
+    medians = {}
+    for label, cmd in measurements:
+        timings = time_command(cmd, cwd, env, arg.runs)
+        medians[label] = statistics.median(timings)
+        print("{:<32} {:>8.1f} {:>8.1f} {:>8.1f}".format(label, min(timings), medians[label], max(timings)))
+
+    print()
+    print("Most expensive imports of {} (cumulative milliseconds, python -X importtime):".format(module))
+    for cumulative, name in top_imports(module, cwd, env):
+        print("{:>8.1f}  {}".format(cumulative / 1000.0, name))
+
+    overhead = medians[arg.script + " --help"] - medians["bare interpreter"]
+    within = overhead <= arg.target_ms
+    print()
+    print("Median --help overhead above the bare interpreter: {:.1f} ms (target: {:.1f} ms) - {}"
+          .format(overhead, arg.target_ms, "OK" if within else "OVER TARGET"))
+
+    return 0 if within else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
+##
+#
@@ -0,0 +1,425 @@
+#! /usr/bin/env python3
+#######################################################################################
+
+# Streaming import of Netscape-format bookmark files (the export format of
+# Firefox, Chrome, Safari, Edge and most bookmark services) into SQLite.
+#
+# The file is read and parsed in chunks with html.parser, so memory use does
+# not depend on the size of the export. Folders are inserted as they are
+# opened; bookmarks are collected and inserted in batches of BATCH_SIZE, all
+# in one transaction. After the import, an FTS5 full-text index over the
+# titles and URLs of the new bookmarks is updated in one pass, which is much
+# faster than keeping it up to date row by row.
+#
+# Exports are merged: a folder with the same title under the same parent is
+# reused, and a bookmark whose URL is already in the database (compared by
+# the fingerprint of its normalized URL, see urlnorm.py) is skipped. The
+# fingerprints have a unique index and bookmarks are inserted with INSERT
+# OR IGNORE, so SQLite drops the duplicates in the same executemany(), and
+# memory use stays independent of the size of the database. Every import is recorded with the SHA-256 of the file,
+# and a file which was already imported is not parsed again. Per-folder
+# merge statistics (bookmarks added and duplicates skipped) are kept in the
+# folder_merges table; bookmarks outside any folder only count in the
+# totals of the import.
+#
+# Usage:
+#   ./bmstream.py import bookmarks.html
+#   ./bmstream.py search "python asyncio"
+
+import argparse
+import collections
+import hashlib
+import html.parser
+import os
+import sqlite3
+import sys
+import time
+
+import urlnorm
+
+#######################################################################################
+
+DB_PATH = "data/bookmarks.db"
+CHUNK_SIZE = 1 << 16  # Characters of the export fed to the parser at a time.
+BATCH_SIZE = 5000  # Bookmarks per executemany().
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    id INTEGER PRIMARY KEY,
+    parent_id INTEGER REFERENCES folders(id),
+    title TEXT NOT NULL,
+    add_date INTEGER,
+    last_modified INTEGER,
+    ns_root TEXT
+);
+CREATE TABLE IF NOT EXISTS bookmarks (
+    id INTEGER PRIMARY KEY,
+    folder_id INTEGER REFERENCES folders(id),
+    title TEXT NOT NULL,
+    url TEXT NOT NULL,
+    add_date INTEGER,
+    last_modified INTEGER,
+    tags TEXT,
+    description TEXT,
+    fingerprint INTEGER
+);
+CREATE INDEX IF NOT EXISTS bookmarks_folder ON bookmarks(folder_id);
+CREATE UNIQUE INDEX IF NOT EXISTS bookmarks_fingerprint ON bookmarks(fingerprint);
+CREATE INDEX IF NOT EXISTS folders_parent_title ON folders(parent_id, title);
+CREATE VIRTUAL TABLE IF NOT EXISTS bookmarks_fts USING fts5(
+    title, url, content='bookmarks', content_rowid='id'
+);
+CREATE TABLE IF NOT EXISTS imports (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    imported_at INTEGER NOT NULL,
+    folders INTEGER NOT NULL,
+    bookmarks INTEGER NOT NULL,
+    added INTEGER NOT NULL,
+    duplicates INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS imports_sha256 ON imports(sha256);
+CREATE TABLE IF NOT EXISTS folder_merges (
+    import_id INTEGER NOT NULL REFERENCES imports(id),
+    folder_id INTEGER NOT NULL REFERENCES folders(id),
+    added INTEGER NOT NULL,
+    duplicates INTEGER NOT NULL,
+    PRIMARY KEY (import_id, folder_id)
+);
+"""
+
+# Firefox marks its root folders with these attributes on the <H3>.
+NS_ROOTS = {
+    "personal_toolbar_folder": "toolbar",
+    "unfiled_bookmarks_folder": "unsorted",
+}
+
+# Result of import_file(). folder_stats maps folder id -> FolderStats.
+ImportResult = collections.namedtuple(
+    "ImportResult", "path skipped folders bookmarks added duplicates folder_stats")
+
+#######################################################################################
+
+
+class FolderStats:
+    __slots__ = ("added", "duplicates")
+
+    def __init__(self):
+        self.added = 0
+        self.duplicates = 0
+
+
+def as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class BookmarkDB:
+    """The SQLite database of imported folders and bookmarks."""
+
+    def __init__(self, path=DB_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.migrate()
+        self.conn.executescript(SCHEMA)
+        self.folder_stats = {}  # folder id -> FolderStats of the current import
+
+    def migrate(self):
+        # Databases created before bookmarks had fingerprints: add and fill in
+        # the column.
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(bookmarks)")]
+        if columns and "fingerprint" not in columns:
+            self.conn.execute("ALTER TABLE bookmarks ADD COLUMN fingerprint INTEGER")
+            rows = self.conn.execute("SELECT id, url FROM bookmarks").fetchall()
+            self.conn.executemany("UPDATE bookmarks SET fingerprint = ? WHERE id = ?",
+                                  ((urlnorm.fingerprint(url), bookmark_id) for bookmark_id, url in rows))
+            self.conn.commit()
+        # Databases created before the fingerprints were unique may hold the
+        # same URL more than once: keep the first fingerprint of each, so
+        # that the unique index can be created. The rows themselves stay.
+        index = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'bookmarks_fingerprint'").fetchone()
+        if columns and index is None:
+            self.conn.execute("UPDATE bookmarks SET fingerprint = NULL WHERE fingerprint IS NOT NULL AND id NOT IN "
+                              "(SELECT min(id) FROM bookmarks WHERE fingerprint IS NOT NULL GROUP BY fingerprint)")
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def find_import(self, sha256):
+        return self.conn.execute("SELECT id FROM imports WHERE sha256 = ?", (sha256,)).fetchone()
+
+    def last_id(self):
+        last_id, = self.conn.execute("SELECT coalesce(max(id), 0) FROM bookmarks").fetchone()
+        return last_id
+
+    def begin_import(self):
+        """Reset the merge statistics. Returns the highest bookmark id
+        before the import."""
+        self.folder_stats = {}
+        return self.last_id()
+
+    def end_import(self, path, sha256, folders, bookmarks, last_id):
+        """Index the bookmarks added since last_id, record the import and
+        its per-folder statistics, and commit."""
+        self.conn.execute("INSERT INTO bookmarks_fts (rowid, title, url) "
+                          "SELECT id, title, url FROM bookmarks WHERE id > ?", (last_id,))
+        added = sum(stats.added for stats in self.folder_stats.values())
+        duplicates = sum(stats.duplicates for stats in self.folder_stats.values())
+        import_id = self.conn.execute(
+            "INSERT INTO imports (path, sha256, imported_at, folders, bookmarks, added, duplicates) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, sha256, int(time.time()), folders, bookmarks, added, duplicates)).lastrowid
+        # Bookmarks outside any folder (folder id None) have no folder row.
+        self.conn.executemany(
+            "INSERT INTO folder_merges (import_id, folder_id, added, duplicates) VALUES (?, ?, ?, ?)",
+            ((import_id, folder_id, stats.added, stats.duplicates)
+             for folder_id, stats in self.folder_stats.items() if folder_id is not None))
+        self.conn.commit()
+        return added, duplicates
+
+    def add_folder(self, parent_id, title, add_date=None, last_modified=None, ns_root=None):
+        # Merge into an existing folder of the same title under the same parent.
+        row = self.conn.execute("SELECT id FROM folders WHERE parent_id IS ? AND title = ?",
+                                (parent_id, title)).fetchone()
+        if row is not None:
+            folder_id = row[0]
+        else:
+            folder_id = self.conn.execute(
+                "INSERT INTO folders (parent_id, title, add_date, last_modified, ns_root) VALUES (?, ?, ?, ?, ?)",
+                (parent_id, title, add_date, last_modified, ns_root)).lastrowid
+        self.folder_stats.setdefault(folder_id, FolderStats())
+        return folder_id
+
+    def add_bookmarks(self, rows):
+        # rows: (folder_id, title, url, add_date, last_modified, tags, description)
+        # Bookmarks whose fingerprint is already in the database (or earlier
+        # in rows) are ignored by the unique index. The rows inserted are
+        # the ones after the previous highest id, which gives the number
+        # added per folder; the rest of each folder's rows are duplicates.
+        submitted = collections.Counter(row[0] for row in rows)
+        last_id = self.last_id()
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO bookmarks "
+            "(folder_id, title, url, add_date, last_modified, tags, description, fingerprint) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", ((*row, urlnorm.fingerprint(row[2])) for row in rows))
+        added = dict(self.conn.execute(
+            "SELECT folder_id, count(*) FROM bookmarks WHERE id > ? GROUP BY folder_id", (last_id,)))
+        for folder_id, count in submitted.items():
+            stats = self.folder_stats.get(folder_id)
+            if stats is None:
+                stats = self.folder_stats[folder_id] = FolderStats()
+            stats.added += added.get(folder_id, 0)
+            stats.duplicates += count - added.get(folder_id, 0)
+
+    def rebuild_index(self):
+        self.conn.execute("INSERT INTO bookmarks_fts(bookmarks_fts) VALUES ('rebuild')")
+
+    def folder_path(self, folder_id):
+        titles = []
+        while folder_id is not None:
+            row = self.conn.execute("SELECT parent_id, title FROM folders WHERE id = ?", (folder_id,)).fetchone()
+            if row is None:
+                break
+            folder_id, title = row
+            titles.append(title)
+        return "/".join(reversed(titles))
+
+    def commit(self):
+        self.conn.commit()
+
+    def counts(self):
+        folders, = self.conn.execute("SELECT count(*) FROM folders").fetchone()
+        bookmarks, = self.conn.execute("SELECT count(*) FROM bookmarks").fetchone()
+        return folders, bookmarks
+
+    def search(self, query, limit=20):
+        """Full-text search of titles and URLs, best matches first.
+        query is in FTS5 syntax: words, "phrases", prefix*, AND/OR/NOT."""
+        return self.conn.execute(
+            "SELECT b.id, b.title, b.url, f.title FROM bookmarks_fts "
+            "JOIN bookmarks b ON b.id = bookmarks_fts.rowid "
+            "LEFT JOIN folders f ON f.id = b.folder_id "
+            "WHERE bookmarks_fts MATCH ? ORDER BY bm25(bookmarks_fts) LIMIT ?",
+            (query, limit)).fetchall()
+
+
+class NetscapeParser(html.parser.HTMLParser):
+    """Incremental parser for the Netscape bookmark file format:
+
+        <DL><p>
+            <DT><H3 ADD_DATE="..">Folder</H3>
+            <DL><p>
+                <DT><A HREF=".." ADD_DATE=".." TAGS="..">Title</A>
+                <DD>Description
+            </DL><p>
+        </DL><p>
+
+    Feed it text with feed() in chunks of any size and call close() at the
+    end. Folders and bookmarks go to `sink` (a BookmarkDB, or anything
+    with the same add_folder() and add_bookmarks()) as they are parsed;
+    only the current folder path and a batch of bookmarks are kept in
+    memory.
+    """
+
+    def __init__(self, sink, batch_size=BATCH_SIZE):
+        super().__init__(convert_charrefs=True)
+        self.sink = sink
+        self.batch_size = batch_size
+        self.batch = []
+        self.folders = [None]  # Stack of open folder ids; None is the top level.
+        self.pending_folder = None  # Id of the folder of the last <H3>, until its <DL> opens.
+        self.text = None  # Text of the <H3>, <A> or <DD> being read, or None.
+        self.element = None  # Attributes of that <H3> or <A>.
+        self.bookmark = None  # Last bookmark row, still open for a <DD> description.
+        self.folder_count = 0
+        self.bookmark_count = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "h3" or tag == "a":
+            self.end_description()
+            self.text = []
+            self.element = dict(attrs)
+        elif tag == "dd" and self.bookmark is not None:
+            self.text = []
+        elif tag == "dl":
+            self.end_description()
+            self.folders.append(self.pending_folder if self.pending_folder is not None else self.folders[-1])
+            self.pending_folder = None
+        elif tag in ("dt", "p"):
+            self.end_description()
+
+    def handle_endtag(self, tag):
+        if tag == "h3" and self.element is not None:
+            attrs = self.element
+            ns_root = next((root for attr, root in NS_ROOTS.items() if attr in attrs), None)
+            self.pending_folder = self.sink.add_folder(
+                self.folders[-1], "".join(self.text).strip(),
+                as_int(attrs.get("add_date")), as_int(attrs.get("last_modified")), ns_root)
+            self.folder_count += 1
+            self.text = self.element = None
+        elif tag == "a" and self.element is not None:
+            attrs = self.element
+            # ICON attributes (base64 favicons) are not kept.
+            self.bookmark = [self.folders[-1], "".join(self.text).strip(), attrs.get("href") or "",
+                             as_int(attrs.get("add_date")), as_int(attrs.get("last_modified")),
+                             attrs.get("tags"), None]
+            self.text = self.element = None
+        elif tag == "dl":
+            self.end_description()
+            if len(self.folders) > 1:
+                self.folders.pop()
+
+    def handle_data(self, data):
+        if self.text is not None:
+            self.text.append(data)
+
+    def end_description(self):
+        # Move the last bookmark, with the <DD> text read after it, if any,
+        # into the batch.
+        if self.bookmark is None:
+            return
+        if self.text is not None and self.element is None:
+            self.bookmark[6] = "".join(self.text).strip() or None
+            self.text = None
+        self.batch.append(self.bookmark)
+        self.bookmark = None
+        self.bookmark_count += 1
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            self.sink.add_bookmarks(self.batch)
+            self.batch = []
+
+    def close(self):
+        super().close()
+        self.end_description()
+        self.flush()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def import_file(path, db, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE):
+    """Stream the bookmark file at path into db, merging it with what is
+    already there, and update the full-text index. A file imported before
+    (same SHA-256) is skipped without parsing. Returns an ImportResult."""
+    sha256 = file_sha256(path)
+    if db.find_import(sha256) is not None:
+        return ImportResult(path, True, 0, 0, 0, 0, {})
+    last_id = db.begin_import()
+    parser = NetscapeParser(db, batch_size)
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            parser.feed(chunk)
+    parser.close()
+    folder_stats = db.folder_stats
+    added, duplicates = db.end_import(path, sha256, parser.folder_count, parser.bookmark_count, last_id)
+    return ImportResult(path, False, parser.folder_count, parser.bookmark_count, added, duplicates, folder_stats)
+
+
+#######################################################################################
+
+
+def run():
+    arg_parser = argparse.ArgumentParser(description="Import Netscape-format bookmark files into SQLite and search them.")
+    arg_parser.add_argument("--db", default=DB_PATH, help="SQLite database (default: %(default)s)")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    import_cmd = commands.add_parser("import", help="import bookmark export files")
+    import_cmd.add_argument("files", nargs="+")
+    import_cmd.add_argument("--folders", action="store_true", help="print merge statistics per folder")
+    search_cmd = commands.add_parser("search", help="full-text search of titles and URLs")
+    search_cmd.add_argument("query")
+    search_cmd.add_argument("--limit", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    db = BookmarkDB(args.db)
+    try:
+        if args.command == "import":
+            for path in args.files:
+                start = time.perf_counter()
+                result = import_file(path, db)
+                elapsed = time.perf_counter() - start
+                if result.skipped:
+                    print("{}: already imported, skipped ({:.2f} s)".format(path, elapsed))
+                    continue
+                print("{}: {} folders, {} bookmarks: {} added, {} duplicates in {:.2f} s".format(
+                    path, result.folders, result.bookmarks, result.added, result.duplicates, elapsed))
+                if args.folders:
+                    for folder_id, stats in sorted(result.folder_stats.items(), key=lambda item: item[0] or 0):
+                        print("    {}: {} added, {} duplicates".format(
+                            db.folder_path(folder_id) or "(top level)", stats.added, stats.duplicates))
+        else:
+            start = time.perf_counter()
+            rows = db.search(args.query, args.limit)
+            elapsed = time.perf_counter() - start
+            for _, title, url, folder in rows:
+                print("{}  [{}]\n    {}".format(title, folder or "", url))
+            print("{} results in {:.1f} ms".format(len(rows), elapsed * 1000))
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(run())
+
+
+##
+#
@@ -1,15 +1,24 @@
 #! /usr/bin/env python3
 #######################################################################################
 
-import pprint
-import bookmarks_parser
+import bmstream
 
 #######################################################################################
 
 
 def run():
-    bookmarks = bookmarks_parser.parse("bookmarks2.html")
-    pprint.pprint(bookmarks)
+    # Streams the export into the SQLite database (data/bookmarks.db) instead
+    # of loading the whole bookmark tree into memory. See bmstream.py.
+    db = bmstream.BookmarkDB()
+    try:
+        result = bmstream.import_file("bookmarks2.html", db)
+        if result.skipped:
+            print("bookmarks2.html was already imported")
+        else:
+            print("Imported {} folders, {} bookmarks: {} added, {} duplicates".format(
+                result.folders, result.bookmarks, result.added, result.duplicates))
+    finally:
+        db.close()
 
 
 if __name__ == '__main__':
@@ -18,4 +27,3 @@ if __name__ == '__main__':
 
 ##
 #
-
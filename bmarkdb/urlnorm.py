@@ -0,0 +1,77 @@
+#! /usr/bin/env python3
+#######################################################################################
+
+# URL normalization and fingerprints, for recognizing the same bookmark in
+# exports from different browsers and users.
+#
+# Two URLs which differ only in ways that do not change the page they lead
+# to normalize to the same string:
+#
+#   HTTP://Example.COM:80/a/b/?utm_source=x&b=2&a=1#
+#   http://example.com/a/b?a=1&b=2
+#
+# The fingerprint of a URL is a 64-bit hash of its normalized form, small
+# enough to index millions of them in memory and in SQLite.
+
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+#######################################################################################
+
+DEFAULT_PORTS = {"http": 80, "https": 443, "ftp": 21}
+
+# Query parameters which only track where a click came from.
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "twclid", "igshid",
+    "mc_cid", "mc_eid", "_hsenc", "_hsmi", "mkt_tok", "ref_src", "si",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "__hs")
+
+#######################################################################################
+
+
+def is_tracking(param):
+    param = param.lower()
+    return param in TRACKING_PARAMS or param.startswith(TRACKING_PREFIXES)
+
+
+def normalize_url(url):
+    """Return the normalized form of url: scheme and host in lower case,
+    default port, trailing slash of the path, empty fragment and tracking
+    query parameters removed, remaining parameters sorted. Strings which
+    do not parse as URLs (javascript:, place:, garbage) are returned
+    stripped but otherwise unchanged."""
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    if not parts.netloc:
+        return url
+    host = (parts.hostname or "").rstrip(".")
+    if ":" in host:  # IPv6 address
+        host = "[{}]".format(host)
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        host = "{}:{}".format(host, port)
+    if parts.username is not None:
+        userinfo = parts.username if parts.password is None else "{}:{}".format(parts.username, parts.password)
+        host = "{}@{}".format(userinfo, host)
+    path = parts.path.rstrip("/")
+    query = parts.query
+    if query:
+        params = [(k, v) for k, v in parse_qsl(query, keep_blank_values=True) if not is_tracking(k)]
+        query = urlencode(sorted(params))
+    return urlunsplit((scheme, host, path, query, parts.fragment))
+
+
+def fingerprint(url):
+    """64-bit fingerprint of the normalized url, as a signed integer (the
+    range of a SQLite INTEGER)."""
+    digest = hashlib.blake2b(normalize_url(url).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+##
+#
@@ -0,0 +1,63 @@
+#! /usr/bin/env python3
+
+# Throughput of the filament launchers as NUMTHREADS grows.
+#
+# For each task count, runs that many worker() tasks with:
+#   basic    one new thread per task (launch_threads_basic)
+#   thread   a pool of POOLSIZE threads (launch_pooled)
+#   process  a pool of POOLSIZE processes (launch_pooled)
+# and prints tasks per second, best of --repeat runs. The pool timings
+# include starting and stopping the pool, as in filament.py.
+#
+# With the default --spin 0 the tasks are tiny and the numbers show the
+# cost of thread creation and task hand-off. A larger --spin makes each
+# task CPU-bound, which shows the GIL: threads stop scaling while
+# processes do (given the cores).
+#
+# Usage:
+#   python3 benchfilament.py
+#   python3 benchfilament.py --spin 100000 --counts 2 10 100
+
+import argparse
+import time
+
+import filament
+
+COUNTS = [2, 5, 10, 20, 50, 100, 200, 500, 1000]
+ENGINES = ["basic", "thread", "process"]
+
+
+def run_once(engine, numtasks, spin):
+    start = time.perf_counter()
+    if engine == "basic":
+        filament.launch_threads_basic(numtasks, spin=spin)
+    else:
+        filament.launch_pooled(engine, numtasks, spin=spin)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare filament launchers at growing task counts.")
+    parser.add_argument("--counts", type=int, nargs="+", default=COUNTS, help="NUMTHREADS values to run")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=ENGINES)
+    parser.add_argument("--spin", type=int, default=0, help="busy-loop iterations per task")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, best is kept")
+    args = parser.parse_args()
+
+    filament.DEVMODE = False  # No printing from worker().
+
+    print("pool size: {}, queue size: {}, spin: {}".format(filament.POOLSIZE, filament.QUEUESIZE, args.spin))
+    print("{:>8}".format("tasks") + "".join("{:>14}".format(engine + " t/s") for engine in args.engines))
+    for count in args.counts:
+        line = "{:>8}".format(count)
+        for engine in args.engines:
+            seconds = min(run_once(engine, count, args.spin) for _ in range(args.repeat))
+            line += "{:>14.0f}".format(count / seconds)
+        print(line, flush=True)
+
+
+if __name__ == '__main__':
+    main()
+
+##
+#
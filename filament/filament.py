@@ -2,44 +2,47 @@
 
 # https://pymotw.com/3/threading/
 
-# To see thread details (system call trace), the PID of the process of the
-# filament program must be known and this can be obtained using something like:
-# ps aux | grep filament
-# This must be done BEFORE the threads are created, hence the time.sleep near
-# the beginning of this prgram must be used to allow time for this grep.
-# Then as sudo, the dtruss utility will be used to monitor the threads from
-# the TIME OF THREAD CREATION for the now-known PID of filament.py, with this
-# command:
-# sudo dtruss -ap PID
-# This must be done as root hence the sudo. Substite the grepped PID.
-# If the threads have already been created when the dtruss command is run then
-# no output will be seen.
+# To see thread details, set TRACE. The threads are then traced from the
+# time of their creation by a profile hook installed in this process (see
+# tracing.py): each thread's lifetime, every worker() call and the time
+# spent waiting for locks. The timeline is written to TRACEFILE in Chrome
+# trace format; open it in chrome://tracing or https://ui.perfetto.dev.
+# This needs no root and no attaching of dtruss by PID. With ENGINE set to
+# "process" only the threads of this process are traced, not the workers.
 #
 
+import concurrent.futures
 import curses
+import os
+import queue
 import threading
 import uuid
 import random
 import time
 
+import tracing
+
 DEVMODE = True
-NUMTHREADS = 2
+NUMTHREADS = 2  # Number of worker() tasks to run.
+
+# How main() runs the tasks:
+# "basic"   - one new thread per task (launch_threads_basic)
+# "thread"  - a fixed-size pool of POOLSIZE threads (launch_pooled)
+# "process" - a fixed-size pool of POOLSIZE processes (launch_pooled)
+# See benchfilament.py for how they compare as NUMTHREADS grows.
+ENGINE = "thread"
+POOLSIZE = os.cpu_count() or 2
+QUEUESIZE = 2 * POOLSIZE  # Tasks submitted to the pool and not yet finished, at most.
 
-scrn = curses.initscr()
-curses.noecho()  # Don't echo keypresses to terminal
-curses.cbreak()  # Realtime keypress response (no enter-key buffering)
-scrn.keypad(True)  # Enable label access to special keys (e.g. curses.KEY_LEFT)
+# Seconds to leave the output on the screen before releasing the terminal.
+DISPLAYTIME = 10
 
-# Curses coordinate system is (Y, X) with (0, 0) top-left
-# Y range of lines is 0 to LINES - 1. X range of columns is 0 to COLS - 1.
-mainheight = curses.LINES
-mainwidth = curses.COLS
-mainmax_y = mainheight - 1
-mainmax_x = mainwidth - 1
+TRACE = True
+TRACEFILE = "filament-trace.json"
 
-if DEVMODE:
-    print ("Screen height: {} - Screen width: {}"
-           .format(mainheight, mainwidth))
+# Most screen updates per second the renderer makes, however many updates
+# the workers post.
+MAXFPS = 20
 
 MUCHMETAL = "platinum gold silver copper iron aluminum zinc lead nickel "\
             "cobalt chromium titanium tungsten magnesium mercury lithium "\
@@ -49,52 +52,209 @@ CHOICES = 8
 metals = []
 metals = MUCHMETAL.split()
 
-# Use this sleep here before thread creation to be able to grep the PID
-# of filament.py to use in the dtruss command when you want to see thread
-# details. 30 seconds should be enough time to grep and then run dtruss.
-time.sleep(30)
+def init_screen():
+    scrn = curses.initscr()
+    curses.noecho()  # Don't echo keypresses to terminal
+    curses.cbreak()  # Realtime keypress response (no enter-key buffering)
+    scrn.keypad(True)  # Enable label access to special keys (e.g. curses.KEY_LEFT)
+    return scrn
+
+
+def restore_screen(scrn):
+    #  Return terminal window to normal behavior and release it from curses
+    curses.nocbreak()
+    scrn.keypad(False)
+    curses.echo()
+    curses.endwin()
 
 
 def get_uuid():
     return uuid.uuid4()
 
 
+#  RENDERER
+#  ############################################################################
+class Renderer(threading.Thread):
+    # The only thread which touches the screen. Workers call post() with a
+    # line of status for their task; the renderer keeps the latest line
+    # per task and, at most MAXFPS times a second, redraws just the rows
+    # whose line changed since the last frame, with a single doupdate().
+    # Row 0 is a header; task seqid is shown on row 1 + seqid % (rows - 1),
+    # so with more tasks than rows, later tasks reuse the rows.
+
+    def __init__(self, scrn, maxfps=MAXFPS):
+        super().__init__(name="renderer", daemon=True)
+        self.scrn = scrn
+        self.frametime = 1.0 / maxfps
+        self.updates = queue.SimpleQueue()
+        self.posted = 0
+        self.frames = 0
+        self.stopping = False
+
+    def post(self, seqid, text):
+        # Called from any thread. Cheap: just a queue put.
+        self.updates.put((seqid, text))
+
+    def stop(self):
+        # Draw whatever is still queued, then end the thread.
+        self.stopping = True
+        self.updates.put(None)
+        self.join()
+
+    def run(self):
+        # Curses coordinate system is (Y, X) with (0, 0) top-left
+        # Y range of lines is 0 to LINES - 1. X range of columns is 0 to COLS - 1.
+        height, width = self.scrn.getmaxyx()
+        rows = max(1, height - 1)
+        dirty = {}  # row -> text, coalesced since the last frame
+        lastframe = 0.0
+        while True:
+            # Block until something is posted, then gather everything else
+            # posted until the next frame is due.
+            item = self.updates.get()
+            deadline = max(time.monotonic(), lastframe + self.frametime)
+            while item is not None:
+                seqid, text = item
+                dirty[1 + seqid % rows] = "{:>5} {}".format(seqid, text)
+                self.posted += 1
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.updates.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            self.draw(dirty, height, width)
+            dirty.clear()
+            lastframe = time.monotonic()
+            if item is None and self.stopping:
+                return
+
+    def draw(self, dirty, height, width):
+        self.frames += 1
+        header = "Screen {}x{} - {} updates, {} frames".format(height, width, self.posted, self.frames)
+        for row, text in [(0, header)] + sorted(dirty.items()):
+            self.scrn.move(row, 0)
+            self.scrn.clrtoeol()
+            # Not the very last column: writing there on the last row raises.
+            self.scrn.addnstr(row, 0, text, width - 1)
+        self.scrn.noutrefresh()
+        curses.doupdate()
+#  ############################################################################
+
+
 #  THREAD - BASIC
 #  ############################################################################
-def worker(seqid, uniqueid):
-    threadname = threading.current_thread().getName()
+def worker(seqid, uniqueid, spin=0, report=None, echo=None):
+    # spin adds that many iterations of pure Python busy work, to give the
+    # task a CPU-bound part (see benchfilament.py). report, if given, is
+    # called with (seqid, status text), e.g. Renderer.post. Without report,
+    # the result is printed if echo is true (by default, if DEVMODE is).
+    # Never print while the renderer owns the screen.
+    threadname = threading.current_thread().name
     randlist = []
+    if report is not None:
+        report(seqid, "{} running".format(threadname))
     for r in range(CHOICES):
         randlist.append(random.choice(metals))
+    for _ in range(spin):
+        pass
 
-    if DEVMODE:
+    echo = DEVMODE if echo is None else echo
+    if report is not None:
+        report(seqid, "{} {}".format(threadname, "-".join(randlist)))
+    elif echo:
         print ("---------------------------------------------------------")
         print ("Sequence ID: {} - UUID: {}".format(seqid, uniqueid))
         print ("Threadname: {}".format(threadname))
         print ("Random metals: {}".format("-".join(randlist)))
+    return "-".join(randlist)
 #  ############################################################################
 
 
-threads = []
-
-
-def launch_threads_basic():
-    for seqid in range(NUMTHREADS):
+#  LAUNCHERS
+#  ############################################################################
+def launch_threads_basic(numtasks=NUMTHREADS, spin=0, report=None):
+    # One thread per task, all started at once, then joined.
+    threads = []
+    for seqid in range(numtasks):
         uniqueid = get_uuid()
-        t = threading.Thread(target=worker, args=(seqid, uniqueid))
+        t = threading.Thread(target=worker, args=(seqid, uniqueid, spin, report))
         threads.append(t)
         t.start()
+    for t in threads:
+        t.join()
+
+
+def launch_pooled(engine=ENGINE, numtasks=NUMTHREADS, poolsize=POOLSIZE, queuesize=QUEUESIZE, spin=0,
+                  report=None):
+    # Submit the tasks to a pool of poolsize threads or processes. At most
+    # queuesize tasks are queued or running at a time: submitting blocks
+    # until one finishes, so a large numtasks does not pile up in the
+    # pool's queue. Returns the results of worker() in task order, once
+    # every task has finished; an exception in a task is raised here.
+    # Process workers cannot call report, so for them it is called here,
+    # with the result, as each task finishes. They are told explicitly
+    # whether to print: not at all when there is a report (the screen
+    # belongs to the renderer then), and a spawned child process would
+    # not see a DEVMODE changed in this one anyway.
+    if engine == "thread":
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=poolsize)
+    elif engine == "process":
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=poolsize)
+    else:
+        raise ValueError("Unknown engine: {}".format(engine))
+    slots = threading.BoundedSemaphore(queuesize)
+    futures = []
+
+    def done(future, seqid):
+        slots.release()
+        if report is not None and engine == "process" and future.exception() is None:
+            report(seqid, future.result())
+
+    with executor:
+        for seqid in range(numtasks):
+            slots.acquire()
+            if engine == "process":
+                future = executor.submit(worker, seqid, get_uuid(), spin, None, DEVMODE and report is None)
+            else:
+                future = executor.submit(worker, seqid, get_uuid(), spin, report)
+            future.add_done_callback(lambda f, seqid=seqid: done(f, seqid))
+            futures.append(future)
+        concurrent.futures.wait(futures)
+    return [future.result() for future in futures]
+#  ############################################################################
+
+
+def main():
+    tracer = None
+    if TRACE:
+        tracer = tracing.Tracer(spans=[worker])
+        tracer.install()
+
+    scrn = init_screen()
+    try:
+        renderer = Renderer(scrn)
+        renderer.start()
+        try:
+            if ENGINE == "basic":
+                launch_threads_basic(report=renderer.post)
+            else:
+                launch_pooled(report=renderer.post)
+        finally:
+            renderer.stop()
 
+        if tracer is not None:
+            tracer.uninstall()
+            tracer.save(TRACEFILE)
 
-launch_threads_basic()
+        time.sleep(DISPLAYTIME)
+    finally:
+        restore_screen(scrn)
 
-time.sleep(10)
 
-#  Return terminal window to normal behavior and release it from curses
-curses.nocbreak()
-scrn.keypad(False)
-curses.echo()
-curses.endwin()
+if __name__ == '__main__':
+    main()
 
 ##
 #
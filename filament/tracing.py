@@ -0,0 +1,234 @@
+#! /usr/bin/env python3
+
+# In-process thread tracing, exported as a Chrome trace.
+#
+# Tracer.install() sets a profile hook (sys.setprofile for the current
+# thread, threading.setprofile for threads started afterwards). For each
+# thread the hook records, into a buffer of its own:
+#
+#   - the thread's lifetime, from its first profiled call to the return
+#     of its outermost frame
+#   - every call of the functions given as `spans` (e.g. worker())
+#   - every lock acquire which blocked for at least `min_wait` seconds
+#
+# Lock waits are measured by the locks themselves. While the tracer is
+# installed, threading.Lock and threading.RLock are replaced by the
+# classes TracedLock and TracedRLock, whose locks wrap a real one in
+# _TracedLock. Its acquire() (and so `with lock:`) first tries the lock
+# without blocking and times only an acquire which has to wait. That
+# covers locks made through the threading module after install(),
+# including those of Condition, Semaphore and queue.Queue. Not covered:
+# locks created before install(), locks made with _thread.allocate_lock()
+# or by a name imported before install() (`from threading import Lock`),
+# and C-level locking such as queue.SimpleQueue.
+#
+# Blocking in Thread.join(), Event.wait(), Condition.wait() or
+# concurrent.futures.wait() is waiting for something to happen, not for
+# a lock, and is not recorded: it blocks on locks internal to threading,
+# which are not wrapped. (Re-acquiring a Condition's own lock after a
+# wakeup is a lock wait, and is.)
+#
+# Because the replacements are classes, isinstance(lock, threading.Lock)
+# keeps working while the tracer is installed, for locks created since.
+# It is False for locks created before install(), or after uninstall()
+# against a Lock created while installed.
+#
+# save() writes the buffers as a Chrome trace event JSON file, which can
+# be opened in chrome://tracing or https://ui.perfetto.dev to see the
+# threads on a timeline. No root, dtruss or strace needed; works
+# anywhere Python does. Only threads of this process are traced, not the
+# workers of a process pool.
+#
+# The hook runs on every Python and C function call and return of a
+# traced thread, so it does as little as possible there: an identity
+# check against the few interesting code objects, and a tuple appended
+# to a plain list.
+
+import json
+import os
+import sys
+import threading
+import time
+
+# The lock factories of the threading module, and the installed Tracer.
+_Lock = threading.Lock
+_RLock = threading.RLock
+_tracer = None
+
+
+class _Buffer:
+    # Per-thread trace state. Only the owning thread writes to it.
+
+    __slots__ = ("tid", "name", "events", "depth", "started", "ended", "calls")
+
+    def __init__(self, tid, name, started):
+        self.tid = tid
+        self.name = name
+        self.events = []  # (name, start ns, duration ns, args)
+        self.depth = 0
+        self.started = started
+        self.ended = None
+        self.calls = []  # start ns of open span calls
+
+
+class _TracedLock:
+    # A Lock or RLock which reports to the installed Tracer how long its
+    # blocking acquires waited. Everything else is passed on to the
+    # wrapped lock, so Condition can use an RLock's private methods.
+
+    __slots__ = ("_lock",)
+
+    def __init__(self, lock):
+        self._lock = lock
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self._lock.acquire(False):
+            return True
+        tracer = _tracer
+        if not blocking or tracer is None:
+            return self._lock.acquire(blocking, timeout)
+        start = time.perf_counter_ns()
+        try:
+            return self._lock.acquire(True, timeout)
+        finally:
+            tracer.lock_wait(start)
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+    def __getattr__(self, name):
+        return getattr(self._lock, name)
+
+    def __repr__(self):
+        return "<traced {!r}>".format(self._lock)
+
+
+class TracedLock(_TracedLock):
+    """threading.Lock while a Tracer is installed."""
+
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(_Lock())
+
+
+class TracedRLock(_TracedLock):
+    """threading.RLock while a Tracer is installed."""
+
+    __slots__ = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(_RLock(*args, **kwargs))
+
+
+class Tracer:
+
+    def __init__(self, spans=(), min_wait=0.0001):
+        self.span_codes = {function.__code__: function.__name__ for function in spans}
+        self.min_wait_ns = int(min_wait * 1e9)
+        self.origin = time.perf_counter_ns()
+        self.buffers = []
+        self.buffers_lock = threading.Lock()
+        self.local = threading.local()
+
+    def install(self):
+        global _tracer
+        _tracer = self
+        threading.Lock = TracedLock
+        threading.RLock = TracedRLock
+        threading.setprofile(self.hook)
+        sys.setprofile(self.hook)
+
+    def uninstall(self):
+        # Threads still running keep their hook until they end. Locks
+        # created while installed stay wrapped; they keep working but no
+        # longer record waits.
+        global _tracer
+        threading.setprofile(None)
+        sys.setprofile(None)
+        threading.Lock, threading.RLock = _Lock, _RLock
+        _tracer = None
+
+    def buffer(self):
+        now = time.perf_counter_ns()
+        thread = threading.current_thread()
+        buffer = _Buffer(thread.native_id if hasattr(thread, "native_id") else thread.ident, thread.name, now)
+        with self.buffers_lock:
+            self.buffers.append(buffer)
+        self.local.buffer = buffer
+        return buffer
+
+    def lock_wait(self, start):
+        # Called by a _TracedLock whose acquire() blocked from start until
+        # now, in the thread which waited.
+        waited = time.perf_counter_ns() - start
+        if waited < self.min_wait_ns:
+            return
+        try:
+            buffer = self.local.buffer
+        except AttributeError:
+            buffer = self.buffer()
+        buffer.events.append(("lock wait", start, waited, None))
+
+    def hook(self, frame, event, arg):
+        try:
+            buffer = self.local.buffer
+        except AttributeError:
+            buffer = self.buffer()
+
+        if event == "call":
+            buffer.depth += 1
+            if frame.f_code in self.span_codes:
+                buffer.calls.append(time.perf_counter_ns())
+        elif event == "return":
+            if buffer.depth == 0:
+                # Returning from a frame entered before the hook was set.
+                return
+            buffer.depth -= 1
+            code = frame.f_code
+            if code in self.span_codes and buffer.calls:
+                start = buffer.calls.pop()
+                buffer.events.append((self.span_codes[code], start, time.perf_counter_ns() - start,
+                                      {k: frame.f_locals[k] for k in code.co_varnames[:code.co_argcount]
+                                       if k in frame.f_locals and isinstance(frame.f_locals[k], (int, str))}))
+            if buffer.depth == 0 and buffer.ended is None:
+                # The outermost traced frame returned: for a thread started
+                # after install(), that is Thread.run().
+                buffer.ended = time.perf_counter_ns()
+
+    def trace_events(self):
+        # Chrome trace event format: "X" complete events, timestamps and
+        # durations in microseconds, and thread names as metadata.
+        pid = os.getpid()
+        now = time.perf_counter_ns()
+        events = []
+        with self.buffers_lock:
+            buffers = list(self.buffers)
+        for buffer in buffers:
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": buffer.tid,
+                           "args": {"name": buffer.name}})
+            # A thread still running (such as the main thread) ends now.
+            ended = buffer.ended or now
+            events.append({"name": "thread " + buffer.name, "ph": "X", "pid": pid, "tid": buffer.tid,
+                           "ts": (buffer.started - self.origin) / 1000, "dur": (ended - buffer.started) / 1000})
+            for name, start, duration, args in list(buffer.events):
+                event = {"name": name, "ph": "X", "pid": pid, "tid": buffer.tid,
+                         "ts": (start - self.origin) / 1000, "dur": duration / 1000}
+                if args:
+                    event["args"] = args
+                events.append(event)
+        return events
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, f)
+
+
+##
+#
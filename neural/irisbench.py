@@ -0,0 +1,104 @@
+# Headless speed benchmark of the irisnet models (see irisnet.py --benchmark).
+#
+# For each model of irisnet.get_models() and each dataset size, on synthetic
+# data shaped like Iris (4 features, 3 classes) from make_classification:
+#
+#   fit_seconds          time to fit the model on the whole dataset
+#   single_p50_ms/p99    latency of predict() on one row, as a server sees it
+#   batch_rows_per_s     throughput of predict() on batches of each size
+#
+# Results are written as JSON and CSV (one row per model, size and batch
+# size), to choose a model for serving by latency as well as accuracy.
+#
+# Some models do not scale to large training sets at all (SVC fitting is
+# worse than quadratic in the number of rows); they are skipped above
+# MAX_FIT_ROWS rather than left running for hours.
+
+import csv
+import json
+import os
+import platform
+import time
+
+import numpy
+from sklearn.datasets import make_classification
+
+import irisnet
+
+ROWS = [1000, 100000, 1000000]
+BATCH_SIZES = [1, 10, 100, 1000, 10000]
+SINGLE_PREDICTS = 200  # predict() calls on one row, for the latency percentiles.
+MIN_BATCH_SECONDS = 0.2  # Repeat each batch size for at least this long.
+MAX_FIT_ROWS = {'SVM': 20000}
+
+FIELDS = ['model', 'rows', 'fit_seconds', 'single_p50_ms', 'single_p99_ms', 'batch_size', 'batch_rows_per_s']
+
+
+def make_dataset(rows):
+    return make_classification(n_samples=rows, n_features=4, n_informative=3, n_redundant=1,
+                               n_classes=3, random_state=irisnet.seed)
+
+
+def time_single(model, X):
+    latencies = []
+    for i in range(SINGLE_PREDICTS):
+        row = X[i % len(X):i % len(X) + 1]
+        start = time.perf_counter()
+        model.predict(row)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000
+
+
+def time_batch(model, X, batch_size):
+    batch = X[:batch_size]
+    if len(batch) < batch_size:  # Fewer rows than the batch size: tile them.
+        batch = numpy.resize(X, (batch_size, X.shape[1]))
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        model.predict(batch)
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_BATCH_SECONDS:
+            return calls * batch_size / elapsed
+
+
+def run(rows_list=ROWS, batch_sizes=BATCH_SIZES, report=None, log=print):
+    records = []
+    for rows in rows_list:
+        X, Y = make_dataset(rows)
+        for name, model in irisnet.get_models():
+            if rows > MAX_FIT_ROWS.get(name, rows):
+                log("%-5s %9d rows: skipped (above %d rows)" % (name, rows, MAX_FIT_ROWS[name]))
+                continue
+            start = time.perf_counter()
+            model.fit(X, Y)
+            fit_seconds = time.perf_counter() - start
+            p50, p99 = time_single(model, X)
+            throughputs = [(batch_size, time_batch(model, X, batch_size)) for batch_size in batch_sizes]
+            log("%-5s %9d rows: fit %8.3fs  single p50 %7.3fms p99 %7.3fms  rows/s %s" % (
+                name, rows, fit_seconds, p50, p99,
+                " ".join("%d:%.0f" % throughput for throughput in throughputs)))
+            for batch_size, rows_per_s in throughputs:
+                records.append(dict(zip(FIELDS, (name, rows, fit_seconds, p50, p99, batch_size, rows_per_s))))
+    if report:
+        write_report(report, records)
+    return records
+
+
+def write_report(path, records):
+    # path.json and path.csv; a .json or .csv extension on path is dropped.
+    # Returns the path the extensions were added to.
+    base, ext = os.path.splitext(path)
+    if ext not in ('.json', '.csv'):
+        base = path
+    os.makedirs(os.path.dirname(base) or '.', exist_ok=True)
+    with open(base + '.json', 'w') as f:
+        json.dump({'python': platform.python_version(), 'platform': platform.platform(),
+                   'cpus': os.cpu_count(), 'results': records}, f, indent=2)
+    with open(base + '.csv', 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(records)
+    return base
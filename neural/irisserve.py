@@ -0,0 +1,193 @@
+# Prediction server for the irisnet models.
+#
+# At startup every model of irisnet.get_models() is fitted on the Iris
+# training split, or loaded from the model registry (modelstore.py) when it
+# was fitted before, and kept in memory.
+#
+#   POST /predict?model=KNN   {"features": [5.1, 3.5, 1.4, 0.2]}
+#                             -> {"model": "KNN", "class": "Iris-setosa"}
+#   POST /predict?model=KNN   {"rows": [[...], [...]]} -> {"model": "KNN", "classes": [...]}
+#   GET  /models              -> {"models": ["LR", ...]}
+#
+# Requests are served by one thread each. Single rows are not predicted in
+# the request thread: they are queued to a per-model batcher thread which
+# collects the rows arriving within MAX_WAIT of each other (up to
+# MAX_BATCH) and predicts them with one vectorized predict() call. Under
+# concurrent load that replaces many small predict() calls, each of which
+# costs about as much as a batch of a hundred rows, with a few large ones.
+#
+# Usage:
+#   python3 irisserve.py --port 8000
+#   python3 irisserve.py --no-batching     one predict() per request, to compare
+
+import argparse
+import concurrent.futures
+import json
+import math
+import os
+import queue
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy
+
+import irisnet
+from modelstore import ModelRegistry
+
+MAX_BATCH = 256
+MAX_WAIT = 0.002  # Seconds a batch stays open for more rows after its first.
+DEFAULT_MODEL = 'KNN'
+
+
+class MicroBatcher:
+
+    def __init__(self, model, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = queue.SimpleQueue()
+        self.batches = 0
+        self.rows = 0
+        threading.Thread(target=self.run, name="batcher", daemon=True).start()
+
+    def predict(self, row):
+        # Called from request threads; blocks until the row's batch is done.
+        future = concurrent.futures.Future()
+        self.requests.put((row, future))
+        return future.result()
+
+    def run(self):
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self.batches += 1
+            self.rows += len(batch)
+            try:
+                classes = self.model.predict(numpy.array([row for row, future in batch], dtype=numpy.float64))
+            except Exception:
+                # Predict the rows one at a time, so that only the row
+                # which fails gets the error, not the whole batch.
+                for row, future in batch:
+                    try:
+                        future.set_result(self.model.predict(numpy.array([row], dtype=numpy.float64))[0])
+                    except Exception as e:
+                        future.set_exception(e)
+                continue
+            for (row, future), result in zip(batch, classes):
+                future.set_result(result)
+
+
+class Handler(BaseHTTPRequestHandler):
+    # Keep-alive connections: every response has a Content-Length.
+    protocol_version = "HTTP/1.1"
+    # Set on the class by serve().
+    models = {}
+    batchers = {}
+
+    def log_message(self, format, *args):
+        pass  # No line per request on stderr.
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if urlsplit(self.path).path == "/models":
+            self.send_json(200, {"models": list(self.models)})
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/predict":
+            self.send_json(404, {"error": "not found"})
+            return
+        name = parse_qs(url.query).get("model", [DEFAULT_MODEL])[0]
+        model = self.models.get(name)
+        if model is None:
+            self.send_json(404, {"error": "unknown model %r" % name})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if "rows" in body:
+                rows = numpy.array(body["rows"], dtype=numpy.float64).reshape(-1, 4)
+                if not len(rows):
+                    raise ValueError("rows must not be empty")
+                if not numpy.isfinite(rows).all():
+                    raise ValueError("rows must be finite numbers")
+            else:
+                row = [float(value) for value in body["features"]]
+                if len(row) != 4 or not all(math.isfinite(value) for value in row):
+                    raise ValueError("features must be 4 finite numbers")
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        try:
+            if "rows" in body:
+                self.send_json(200, {"model": name, "classes": model.predict(rows).tolist()})
+                return
+            batcher = self.batchers.get(name)
+            if batcher is not None:
+                result = batcher.predict(row)
+            else:
+                result = model.predict(numpy.array([row]))[0]
+        except Exception as e:
+            self.send_json(500, {"error": "prediction failed: %s" % e})
+            return
+        self.send_json(200, {"model": name, "class": str(result)})
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # Listen backlog; the default of 5 drops connections under load.
+
+
+def load_models(data_dir=irisnet.DATA_DIR):
+    dataset = irisnet.load_dataset(data_dir)
+    X_train, X_validation, Y_train, Y_validation = irisnet.split(dataset)
+    registry = ModelRegistry(os.path.join(data_dir, "models"))
+    return {name: registry.get_or_fit(name, model, X_train, Y_train) for name, model in irisnet.get_models()}
+
+
+def serve(host, port, batching=True, data_dir=irisnet.DATA_DIR):
+    Handler.models = load_models(data_dir)
+    Handler.batchers = {name: MicroBatcher(model) for name, model in Handler.models.items()} if batching else {}
+    server = Server((host, port), Handler)
+    print("Serving %s on http://%s:%d (micro-batching %s)" % (
+        ", ".join(Handler.models), host, port, "on" if batching else "off"))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve predictions of the irisnet models over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--no-batching', action='store_true', help="predict each request on its own")
+    parser.add_argument('--data-dir', default=irisnet.DATA_DIR, help="dataset cache directory")
+    args = parser.parse_args()
+    return serve(args.host, args.port, not args.no_batching, args.data_dir)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
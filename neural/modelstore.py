@@ -0,0 +1,61 @@
+# Registry of fitted models, persisted with joblib.
+#
+# A fitted model is stored under a key hashed from everything its fit
+# depends on: the model's name and class, its parameters, the scikit-learn
+# version and the exact training data. Asking for the same model on the
+# same data again loads it from disk (or from memory, within one process)
+# instead of fitting it; any change to the data or parameters gives a new
+# key and a fresh fit.
+
+import hashlib
+import os
+
+import joblib
+import numpy
+import sklearn
+
+import irisnet
+
+MODELS_DIR = os.path.join(irisnet.DATA_DIR, "models")
+
+
+def model_key(name, model, X, Y):
+    digest = hashlib.sha256()
+    for part in (name, type(model).__module__, type(model).__qualname__,
+                 repr(sorted(model.get_params().items())), sklearn.__version__):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    for array in (numpy.asarray(X, dtype=numpy.float64), numpy.asarray(Y).astype(str)):
+        array = numpy.ascontiguousarray(array)
+        digest.update(str((array.dtype.str, array.shape)).encode("utf-8"))
+        digest.update(array.data)
+    return "%s-%s" % (name, digest.hexdigest()[:32])
+
+
+class ModelRegistry:
+
+    def __init__(self, directory=MODELS_DIR):
+        self.directory = directory
+        self.loaded = {}  # key -> fitted model
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".joblib")
+
+    def get_or_fit(self, name, model, X, Y):
+        # The fitted model for (name, model parameters, X, Y): from memory,
+        # from disk, or fitted now and saved.
+        key = model_key(name, model, X, Y)
+        fitted = self.loaded.get(key)
+        if fitted is not None:
+            return fitted
+        path = self.path(key)
+        if os.path.exists(path):
+            fitted = joblib.load(path)
+        else:
+            fitted = model.fit(X, Y)
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = path + ".tmp"
+            joblib.dump(fitted, tmp_path)
+            os.replace(tmp_path, path)
+        self.loaded[key] = fitted
+        return fitted
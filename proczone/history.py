@@ -0,0 +1,182 @@
+#! /usr/bin/env python3
+
+# Fixed-memory sample history.
+#
+# Every metric of every process (or thread) gets a Series. A Series keeps
+# its samples in tiers of ring buffers, each tier at most a fixed number of
+# slots in array('d') columns. A ring grows as slots are written until it
+# is full and then overwrites its oldest slots, so its memory is bounded
+# and a short-lived series only takes what it holds:
+#
+#   raw    every sample as recorded
+#   10 s   one slot per 10 seconds: min, max and avg of the samples in it
+#   1 min  the same per minute
+#
+# The raw tier keeps only a short recent stretch; older data survives in
+# the coarser tiers, which are filled as the samples come in (a slot is
+# written when its period is over). With the default tier sizes a full
+# Series takes about 50 KB (about 15 KB after its first 30 minutes) and
+# covers about 30 minutes raw, 2 hours at 10 s and 12 hours at 1 min.
+#
+# window() returns memoryviews onto the ring buffers, not copies. An array
+# with a memoryview onto it cannot be resized, so a ring never resizes its
+# arrays: it grows by copying into larger ones, which leaves views taken
+# earlier on the old arrays.
+
+import bisect
+from array import array
+from collections import namedtuple
+
+# (seconds per slot, number of slots); 0 seconds is the raw tier.
+TIERS = ((0, 360), (10, 720), (60, 720))
+
+# A contiguous, chronological stretch of one tier. Each field is a
+# memoryview of doubles; for the raw tier min, max and avg are the same
+# view of the sample values.
+Chunk = namedtuple("Chunk", "time min max avg")
+
+
+class Ring:
+    """One tier of a Series: up to `capacity` slots of time, min, max and
+    avg, grown as they are written and overwritten oldest first once
+    full. The arrays may be longer than count; slots past it are unused."""
+
+    def __init__(self, capacity, raw=False):
+        self.capacity = capacity
+        self.raw = raw
+        self.time = array("d")
+        if raw:
+            # A raw sample is its own min, max and avg: store it once.
+            self.min = self.max = self.avg = array("d")
+        else:
+            self.min = array("d")
+            self.max = array("d")
+            self.avg = array("d")
+        self.head = 0  # Next slot to write.
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _grow(self):
+        # Double the arrays, up to capacity, by replacing them.
+        size = min(self.capacity, max(8, 2 * len(self.time)))
+
+        def grown(column):
+            return column + array("d", bytes(column.itemsize * (size - len(column))))
+        self.time = grown(self.time)
+        if self.raw:
+            self.min = self.max = self.avg = grown(self.avg)
+        else:
+            self.min = grown(self.min)
+            self.max = grown(self.max)
+            self.avg = grown(self.avg)
+
+    def append(self, t, low, high, avg):
+        head = self.head
+        if self.count < self.capacity:
+            # Still growing: head is the end of the slots in use.
+            if head == len(self.time):
+                self._grow()
+            self.count += 1
+        self.time[head] = t
+        self.min[head] = low
+        self.max[head] = high
+        self.avg[head] = avg
+        self.head = (head + 1) % self.capacity
+
+    def nbytes(self):
+        columns = {id(column): column for column in (self.time, self.min, self.max, self.avg)}
+        return sum(column.itemsize * len(column) for column in columns.values())
+
+    def window(self, start=None, end=None):
+        """Return the slots with start <= time < end as a list of at most
+        two Chunks (two when the window wraps around the ring), oldest
+        first."""
+        first = (self.head - self.count) % self.capacity
+        if first + self.count <= self.capacity:
+            spans = [(first, first + self.count)]
+        else:
+            spans = [(first, self.capacity), (0, self.head)]
+        chunks = []
+        for lo, hi in spans:
+            times = memoryview(self.time)[lo:hi]
+            a = 0 if start is None else bisect.bisect_left(times, start)
+            b = len(times) if end is None else bisect.bisect_left(times, end)
+            if a < b:
+                chunks.append(Chunk(*(memoryview(column)[lo + a:lo + b]
+                                      for column in (self.time, self.min, self.max, self.avg))))
+        return chunks
+
+
+class Series:
+    """The history of one metric, in the tiers given by `tiers` (see
+    TIERS). Samples must be recorded in time order."""
+
+    def __init__(self, tiers=TIERS):
+        self.rings = {}  # seconds per slot -> Ring
+        self.pending = {}  # seconds per slot -> [slot start, min, max, sum, count] of the open slot
+        for seconds, capacity in tiers:
+            self.rings[seconds] = Ring(capacity, raw=seconds == 0)
+            if seconds:
+                self.pending[seconds] = None
+
+    def record(self, t, value):
+        if 0 in self.rings:
+            self.rings[0].append(t, value, value, value)
+        for seconds, slot in self.pending.items():
+            slot_start = t - t % seconds
+            if slot is not None and slot[0] == slot_start:
+                if value < slot[1]:
+                    slot[1] = value
+                if value > slot[2]:
+                    slot[2] = value
+                slot[3] += value
+                slot[4] += 1
+                continue
+            if slot is not None:
+                self.rings[seconds].append(slot[0], slot[1], slot[2], slot[3] / slot[4])
+            self.pending[seconds] = [slot_start, value, value, value, 1]
+
+    def window(self, seconds=0, start=None, end=None):
+        """Chunks of the tier with `seconds` per slot; see Ring.window().
+        The open (still filling) slot of a coarse tier is not included."""
+        return self.rings[seconds].window(start, end)
+
+    def nbytes(self):
+        return sum(ring.nbytes() for ring in self.rings.values())
+
+
+class History:
+    """Series by (key, metric). A key is whatever identifies the sampled
+    thing: a pid, a (pid, tid) pair. drop() forgets a key when its
+    process or thread is gone, which is what bounds the total memory."""
+
+    def __init__(self, tiers=TIERS):
+        self.tiers = tiers
+        self.series = {}  # key -> {metric: Series}
+
+    def record(self, key, metric, t, value):
+        metrics = self.series.get(key)
+        if metrics is None:
+            metrics = self.series[key] = {}
+        series = metrics.get(metric)
+        if series is None:
+            series = metrics[metric] = Series(self.tiers)
+        series.record(t, value)
+
+    def __contains__(self, key):
+        return key in self.series
+
+    def get(self, key, metric):
+        return self.series.get(key, {}).get(metric)
+
+    def drop(self, key):
+        self.series.pop(key, None)
+
+    def nbytes(self):
+        return sum(series.nbytes() for metrics in self.series.values() for series in metrics.values())
+
+
+##
+#
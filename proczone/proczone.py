@@ -1,8 +1,11 @@
 #! /usr/bin/env python3
 
-import psutils
+import sys
 import time
 
+from history import History
+from scanner import ProcessScanner
+
 SCAN_INTERVAL = 5000  # Milliseconds between scans of the process table.
 # Be careful with SCAN_INTERVALS below 2000 milliseconds as scanning
 # the process table can put demands on system resources and even in the best
@@ -10,6 +13,125 @@ SCAN_INTERVAL = 5000  # Milliseconds between scans of the process table.
 # In any case, the actual frequency of scans can be no faster than the current
 # conditions allow for the completion of a scan.
 
+# SCAN_INTERVAL is where the scanner starts. After each scan it adapts the
+# interval to SCAN_COST_FACTOR times the measured (smoothed) cost of a scan,
+# within the bounds below, so scanning uses about 1/SCAN_COST_FACTOR of the
+# time however large the process table is.
+SCAN_INTERVAL_MIN = 2000
+SCAN_INTERVAL_MAX = 60000
+SCAN_COST_FACTOR = 20
+
+# Number of worker processes to shard each scan across (Linux only). 0
+# scans in this process, which is fastest below some tens of thousands of
+# processes; above that, set it to about the number of cores.
+SCAN_WORKERS = 0
+
+# Milliseconds between samples of the threads of one process (Linux only,
+# see threads.py). A sample of a 500-thread process takes around 20 milliseconds.
+THREAD_SAMPLE_INTERVAL = 250
+
+# Memory budget of the history of one tracked process: two Series (CPU
+# percent and RSS) with the default tiers of history.py, once full. Only
+# processes which have used CPU are tracked (see record_processes()).
+PROCESS_HISTORY_BYTES = 2 * 50 * 1024
+
+
+def report(delta, scanner):
+    for info in delta.added:
+        print(f"+ {info.pid:>7} {info.name:<20} {info.cmdline or ''}")
+    for info in delta.exited:
+        print(f"- {info.pid:>7} {info.name}")
+    print(f"# scan {scanner.scans}: {len(scanner.snapshot)} processes, "
+          f"{len(delta.added)} added, {len(delta.exited)} exited, "
+          f"{len(delta.changed)} changed, "
+          f"{scanner.last_scan_seconds * 1000:.0f} ms, "
+          f"next in {scanner.interval * 1000:.0f} ms")
+
+
+def record_processes(history, scanner, delta, now, cpu_times):
+    # CPU percent and RSS of the active processes. cpu_times holds pid ->
+    # cpu_time at the previous scan, to turn the cumulative CPU time into
+    # a rate. Most processes sleep all the time: a process only gets a
+    # history once it has used CPU between two scans, and keeps it until
+    # it exits. Idle processes cost one cpu_times entry each, a tracked one
+    # up to PROCESS_HISTORY_BYTES.
+    for info in delta.exited:
+        history.drop(info.pid)
+        cpu_times.pop(info.pid, None)
+    for pid, info in scanner.snapshot.items():
+        previous = cpu_times.get(pid)
+        cpu_times[pid] = (now, info.cpu_time)
+        if previous is None:
+            continue
+        cpu_percent = 100.0 * (info.cpu_time - previous[1]) / (now - previous[0])
+        if cpu_percent > 0 or pid in history:
+            history.record(pid, "cpu_percent", now, cpu_percent)
+            history.record(pid, "rss", now, info.rss)
+
+
+def run():
+    history = History()
+    cpu_times = {}
+    scanner = ProcessScanner(interval=SCAN_INTERVAL / 1000,
+                             min_interval=SCAN_INTERVAL_MIN / 1000,
+                             max_interval=SCAN_INTERVAL_MAX / 1000,
+                             cost_factor=SCAN_COST_FACTOR,
+                             workers=SCAN_WORKERS)
+    try:
+        while True:
+            started = time.monotonic()
+            delta = scanner.scan()
+            record_processes(history, scanner, delta, time.time(), cpu_times)
+            report(delta, scanner)
+            time.sleep(max(0.0, scanner.interval - (time.monotonic() - started)))
+    finally:
+        scanner.close()
+
+
+def report_threads(samples, sampler):
+    print(f"# {len(samples)} threads, sampled in {sampler.last_sample_seconds * 1000:.1f} ms")
+    busiest = sorted(samples, key=lambda sample: sample.cpu_percent or 0.0, reverse=True)
+    for sample in busiest[:20]:
+        if sample.cpu_percent is None:
+            continue
+        print(f"  {sample.tid:>7} {sample.name:<16} {sample.state} "
+              f"cpu {sample.cpu_percent:5.1f}% (usr {sample.user_percent:5.1f}% sys {sample.system_percent:5.1f}%) "
+              f"ctxsw/s {sample.voluntary_per_second:7.1f} vol {sample.involuntary_per_second:7.1f} invol")
+
+
+def run_threads(pid):
+    from threads import ThreadSampler
+    history = History()
+    with ThreadSampler(pid) as sampler:
+        while True:
+            try:
+                samples = sampler.sample()
+            except ProcessLookupError:
+                print(f"# process {pid} exited")
+                return
+            now = time.time()
+            live = set()
+            for sample in samples:
+                live.add((pid, sample.tid))
+                if sample.cpu_percent is not None:
+                    history.record((pid, sample.tid), "cpu_percent", now, sample.cpu_percent)
+            for key in set(history.series) - live:  # Threads which exited.
+                history.drop(key)
+            report_threads(samples, sampler)
+            time.sleep(THREAD_SAMPLE_INTERVAL / 1000)
+
+
+if __name__ == '__main__':
+    # With a PID argument, watch the threads of that process instead of
+    # the whole process table.
+    try:
+        if len(sys.argv) > 1:
+            run_threads(int(sys.argv[1]))
+        else:
+            run()
+    except KeyboardInterrupt:
+        pass
+
 
 ##
 #
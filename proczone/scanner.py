@@ -0,0 +1,308 @@
+#! /usr/bin/env python3
+
+# Incremental process-table scanner.
+#
+# Each scan reads the process table and compares it with the snapshot kept
+# from the previous scan. Only the differences are reported: processes
+# which were added, processes which exited and processes whose stats
+# changed. Expensive per-process details (command line, owner) are read
+# once, when a process is first seen, and not on every scan.
+#
+# On Linux the table is read straight from /proc: one read of
+# /proc/<pid>/stat per process per scan. A process whose stat line is
+# byte-for-byte the same as last time (an idle process) is not even
+# parsed. Elsewhere psutil is used, with the same delta logic.
+#
+# The scanner measures what each scan costs and suggests the interval to
+# the next one, so that on hosts with very large process tables the
+# monitoring does not itself become the load.
+#
+# For hosts where even that is too slow (100k+ PIDs), the scanner can
+# shard the PID list across a pool of worker processes (workers > 1,
+# Linux only). Each worker reads and parses its shard and sends back one
+# bytes object of fixed-size packed records, which the parent merges into
+# the snapshot with the same delta logic.
+
+import os
+import struct
+import sys
+import time
+from collections import namedtuple
+
+USE_PROC = sys.platform.startswith("linux") and os.path.isdir("/proc")
+
+if not USE_PROC:
+    import psutil
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# Delta of one scan. added and changed are lists of ProcInfo, exited is a
+# list of the last ProcInfo seen for each process which went away.
+Delta = namedtuple("Delta", "added exited changed")
+
+
+class ProcInfo:
+    """What the scanner knows about one process. cpu_time is user plus
+    system CPU seconds, start_time is in clock ticks since boot on Linux
+    and seconds since the epoch elsewhere; it tells a reused PID apart."""
+
+    __slots__ = ("pid", "ppid", "name", "state", "start_time", "cpu_time",
+                 "num_threads", "rss", "cmdline", "uid", "raw")
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.cmdline = None
+        self.uid = None
+        self.raw = None
+
+    def __repr__(self):
+        return (f"ProcInfo(pid={self.pid}, name={self.name!r}, state={self.state!r}, "
+                f"cpu_time={self.cpu_time:.2f}, threads={self.num_threads}, rss={self.rss})")
+
+
+# One process as packed by a shard worker: pid, ppid, name, state,
+# num_threads, start_time, cpu_time, rss. Names are 15 bytes at most, but
+# for kernel workers which carry their workqueue name (up to 63).
+RECORD = struct.Struct("<ii64sciQdQ")
+
+
+def stat_fields(raw):
+    """Split the bytes of /proc/<pid>/stat into (name, state, ppid,
+    num_threads, start_time, cpu_time, rss), name and state as bytes.
+    Returns None if raw is not a stat line."""
+    # The command name is in parentheses and may itself contain spaces
+    # and parentheses, so the fields are split after the last ')'.
+    close = raw.rfind(b")")
+    if close < 0:
+        return None
+    fields = raw[close + 2:].split()
+    return (raw[raw.find(b"(") + 1:close], fields[0][:1], int(fields[1]), int(fields[17]),
+            int(fields[19]), (int(fields[11]) + int(fields[12])) / CLOCK_TICKS, int(fields[21]) * PAGE_SIZE)
+
+
+def fill_info(info, name, state, ppid, num_threads, start_time, cpu_time, rss):
+    info.name = name.rstrip(b"\0").decode("utf-8", "replace")
+    info.state = state.decode("ascii")
+    info.ppid = ppid
+    info.num_threads = num_threads
+    info.start_time = start_time
+    info.cpu_time = cpu_time
+    info.rss = rss
+
+
+def parse_stat(pid, raw, info=None):
+    """Parse the bytes of /proc/<pid>/stat into a ProcInfo (a new one,
+    or `info` updated in place). Returns None if raw is not a stat line."""
+    fields = stat_fields(raw)
+    if fields is None:
+        return None
+    if info is None:
+        info = ProcInfo(pid)
+    fill_info(info, *fields)
+    info.raw = raw
+    return info
+
+
+def read_stat(pid):
+    """Return the raw /proc/<pid>/stat bytes, or None if the process is
+    gone (or not readable)."""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def read_details(info):
+    """Fill in the details which do not change over a process's life and
+    are only read when the process is first seen."""
+    if USE_PROC:
+        try:
+            with open(f"/proc/{info.pid}/cmdline", "rb") as f:
+                info.cmdline = f.read().rstrip(b"\0").replace(b"\0", b" ").decode("utf-8", "replace")
+            info.uid = os.stat(f"/proc/{info.pid}").st_uid
+        except OSError:
+            pass
+    else:
+        try:
+            process = psutil.Process(info.pid)
+            info.cmdline = " ".join(process.cmdline())
+            info.uid = process.uids().real
+        except (psutil.Error, OSError):
+            pass
+
+
+def list_pids():
+    if USE_PROC:
+        return [int(name) for name in os.listdir("/proc") if name.isdigit()]
+    return psutil.pids()
+
+
+def scan_shard(pids):
+    """Worker side of a sharded scan: read the stat of each pid and
+    return the packed RECORDs of the processes which still exist."""
+    packed = bytearray()
+    for pid in pids:
+        raw = read_stat(pid)
+        fields = None if raw is None else stat_fields(raw)
+        if fields is not None:
+            packed += RECORD.pack(pid, fields[2], fields[0][:63], fields[1], *fields[3:])
+    return bytes(packed)
+
+
+def probe_psutil(pid):
+    """psutil counterpart of read_stat() + parse_stat(): returns a fresh
+    ProcInfo with the frequently changing stats, or None if gone."""
+    try:
+        process = psutil.Process(pid)
+        with process.oneshot():
+            info = ProcInfo(pid)
+            info.name = process.name()
+            info.state = process.status()
+            info.ppid = process.ppid()
+            times = process.cpu_times()
+            info.cpu_time = times.user + times.system
+            info.num_threads = process.num_threads()
+            info.start_time = process.create_time()
+            info.rss = process.memory_info().rss
+    except (psutil.Error, OSError):
+        return None
+    info.raw = (info.start_time, info.state, info.ppid, info.cpu_time, info.num_threads, info.rss)
+    return info
+
+
+class ProcessScanner:
+    """Scans the process table and returns the delta to the last scan.
+
+    interval is the current suggested time between scans, in seconds. It
+    starts at `interval` and after every scan moves towards `cost_factor`
+    times the measured scan duration (smoothed), within `min_interval`
+    and `max_interval`. With a cost_factor of 20, scanning takes at most
+    about 5% of the time.
+
+    With workers > 1 (on Linux) each scan is sharded across a pool of that
+    many worker processes, created on the first scan; close() stops it.
+    """
+
+    def __init__(self, interval=5.0, min_interval=2.0, max_interval=60.0, cost_factor=20.0, workers=0):
+        self.snapshot = {}  # pid -> ProcInfo
+        self.workers = workers if USE_PROC else 0
+        self.pool = None
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.cost_factor = cost_factor
+        self.scan_cost = None  # Smoothed scan duration in seconds.
+        self.last_scan_seconds = 0.0
+        self.last_cpu_seconds = 0.0
+        self.scans = 0
+
+    def collect(self):
+        """Return a dict of pid -> (raw stat, parsed ProcInfo or None) for
+        every current process. The ProcInfo is only parsed when the raw
+        stat differs from the snapshot's."""
+        if self.workers > 1:
+            return self.collect_sharded()
+        current = {}
+        for pid in list_pids():
+            previous = self.snapshot.get(pid)
+            if USE_PROC:
+                raw = read_stat(pid)
+                if raw is None:
+                    continue
+                if previous is not None and raw == previous.raw:
+                    current[pid] = (raw, None)
+                else:
+                    current[pid] = (raw, parse_stat(pid, raw))
+            else:
+                info = probe_psutil(pid)
+                if info is None:
+                    continue
+                if previous is not None and info.raw == previous.raw:
+                    current[pid] = (info.raw, None)
+                else:
+                    current[pid] = (info.raw, info)
+        return current
+
+    def collect_sharded(self):
+        # Like collect(), with the reads and parsing done by the pool. The
+        # raw stat kept for the comparison is the packed record.
+        if self.pool is None:
+            import multiprocessing
+            self.pool = multiprocessing.Pool(self.workers)
+        pids = list_pids()
+        size = -(-len(pids) // self.workers)
+        shards = [pids[i:i + size] for i in range(0, len(pids), size)]
+        current = {}
+        snapshot = self.snapshot
+        for packed in self.pool.imap(scan_shard, shards):
+            view = memoryview(packed)
+            for offset in range(0, len(packed), RECORD.size):
+                raw = bytes(view[offset:offset + RECORD.size])
+                pid, ppid, name, state, *rest = RECORD.unpack(raw)
+                previous = snapshot.get(pid)
+                if previous is not None and raw == previous.raw:
+                    current[pid] = (raw, None)
+                    continue
+                info = ProcInfo(pid)
+                fill_info(info, name, state, ppid, *rest)
+                info.raw = raw
+                current[pid] = (raw, info)
+        return current
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def merge(self, current):
+        """Turn the result of collect() into the new snapshot and return
+        the Delta to the old one."""
+        added, changed = [], []
+        snapshot = {}
+        for pid, (raw, info) in current.items():
+            previous = self.snapshot.pop(pid, None)
+            if info is None:  # Unchanged since the last scan.
+                snapshot[pid] = previous
+                continue
+            if previous is None or previous.start_time != info.start_time:
+                if previous is not None:  # The PID was reused by a new process.
+                    self.snapshot[pid] = previous
+                read_details(info)
+                added.append(info)
+            else:
+                info.cmdline, info.uid = previous.cmdline, previous.uid
+                changed.append(info)
+            snapshot[pid] = info
+        exited = list(self.snapshot.values())
+        self.snapshot = snapshot
+        return Delta(added, exited, changed)
+
+    def scan(self):
+        """Scan the process table and return the Delta to the previous
+        scan. The first scan reports every process as added."""
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+
+        delta = self.merge(self.collect())
+
+        self.last_scan_seconds = time.perf_counter() - wall_start
+        self.last_cpu_seconds = time.process_time() - cpu_start
+        self.scans += 1
+        self.adapt_interval(self.last_scan_seconds)
+        return delta
+
+    def adapt_interval(self, seconds):
+        # Exponentially smoothed, so a single slow scan does not throw the
+        # interval around.
+        if self.scan_cost is None:
+            self.scan_cost = seconds
+        else:
+            self.scan_cost = 0.7 * self.scan_cost + 0.3 * seconds
+        self.interval = min(self.max_interval, max(self.min_interval, self.scan_cost * self.cost_factor))
+
+
+##
+#
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The proczone modules live next to this directory; make them importable
+# however pytest is run (from the repository root or from proczone/).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
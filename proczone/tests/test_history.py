@@ -0,0 +1,33 @@
+import unittest
+
+from history import Ring, Series
+
+
+class RingTest(unittest.TestCase):
+
+    def test_window_views_survive_growth(self):
+        # A window() view holds an export of the ring's arrays; recording
+        # more samples must neither fail nor change what the view shows.
+        series = Series()
+        for t in range(5):
+            series.record(float(t), float(t))
+        chunk, = series.window()
+        for t in range(5, 1000):
+            series.record(float(t), float(t))
+        self.assertEqual(list(chunk.time), [0.0, 1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(list(chunk.avg), [0.0, 1.0, 2.0, 3.0, 4.0])
+        chunk.time.release()
+
+    def test_wraps_once_full(self):
+        ring = Ring(10)
+        for t in range(25):
+            ring.append(float(t), t - 1.0, t + 1.0, float(t))
+        self.assertEqual(len(ring), 10)
+        times = [t for chunk in ring.window() for t in chunk.time]
+        self.assertEqual(times, [float(t) for t in range(15, 25)])
+        lows = [low for chunk in ring.window(17, 20) for low in chunk.min]
+        self.assertEqual(lows, [16.0, 17.0, 18.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
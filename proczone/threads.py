@@ -0,0 +1,245 @@
+#! /usr/bin/env python3
+
+# Per-thread sampling of one process, straight from /proc (Linux only).
+#
+# For every thread of the process, three files are read on each sample:
+#
+#   /proc/<pid>/task/<tid>/stat       state, user and system CPU ticks
+#   /proc/<pid>/task/<tid>/status     voluntary and involuntary context switches
+#   /proc/<pid>/task/<tid>/schedstat  ns on CPU, ns waiting for a CPU, timeslices
+#
+# The files are opened once, when a thread is first seen, and kept open.
+# Each sample re-reads them with os.preadv() at offset 0 into one buffer
+# which is reused for every read, so a sample costs three system calls per
+# thread and no opens or closes. The only allocation per read is a bytes
+# copy of what was read, for parsing. That keeps the cost low enough to
+# poll a process with hundreds of threads several times a second.
+#
+# Kept-open files cost three descriptors per thread, so the sampler raises
+# its soft RLIMIT_NOFILE up to the hard limit and keeps files open for at
+# most as many threads as then fit, leaving FD_RESERVE descriptors for the
+# rest of the program. Threads beyond that, or seen when open() fails with
+# EMFILE anyway, are read by opening and closing their files on each
+# sample instead: slower, but the sampler never runs out of descriptors.
+#
+# Rates (CPU percent, context switches per second) are computed between
+# consecutive samples, so the first sample of a thread has no rates.
+
+import errno
+import os
+import time
+from collections import namedtuple
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+# Large enough for the status file of any thread.
+BUFFER_SIZE = 8192
+
+# Descriptors left free for everything else when keeping files open.
+FD_RESERVE = 64
+
+STAT, STATUS, SCHEDSTAT = range(3)
+
+# One thread in one sample. The *_percent fields are percent of one CPU
+# over the time since the previous sample, the *_per_second fields are
+# rates over the same time; all of them are None for a new thread.
+ThreadSample = namedtuple("ThreadSample", [
+    "tid", "name", "state",
+    "cpu_percent", "user_percent", "system_percent",
+    "wait_percent",  # Time spent runnable but waiting for a CPU.
+    "voluntary_per_second", "involuntary_per_second",
+    "cpu_seconds", "voluntary_switches", "involuntary_switches",
+])
+
+
+class _Thread:
+    """Files and the last counters of one thread. fds holds the kept-open
+    descriptors of the stat, status and schedstat files, or is None when
+    the files are opened on each read."""
+
+    __slots__ = ("tid", "paths", "fds", "has_schedstat",
+                 "utime", "stime", "run_ns", "wait_ns", "voluntary", "involuntary")
+
+    def __init__(self, tid, task_dir, keep_open):
+        self.tid = tid
+        self.paths = (f"{task_dir}/{tid}/stat", f"{task_dir}/{tid}/status", f"{task_dir}/{tid}/schedstat")
+        # schedstat is missing on kernels built without CONFIG_SCHEDSTATS.
+        self.has_schedstat = os.path.exists(self.paths[SCHEDSTAT])
+        self.fds = None
+        self.utime = None
+        if keep_open:
+            fds = []
+            try:
+                for path in self.paths if self.has_schedstat else self.paths[:SCHEDSTAT]:
+                    fds.append(os.open(path, os.O_RDONLY))
+            except OSError as e:
+                for fd in fds:
+                    os.close(fd)
+                if e.errno not in (errno.EMFILE, errno.ENFILE):
+                    raise
+            else:
+                self.fds = fds
+
+    def close(self):
+        if self.fds is not None:
+            for fd in self.fds:
+                os.close(fd)
+            self.fds = None
+
+
+def _field(data, label):
+    # Integer value of a "Label:\tvalue" line of a status file.
+    start = data.find(label)
+    if start < 0:
+        return 0
+    start += len(label)
+    return int(data[start:data.find(b"\n", start)])
+
+
+def _raise_fd_limit():
+    # Raise the soft open-files limit to the hard limit and return how
+    # many descriptors may be spent on kept-open files.
+    import resource
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard != resource.RLIM_INFINITY and soft != hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+            soft = hard
+        except (ValueError, OSError):
+            pass
+    if soft == resource.RLIM_INFINITY:
+        soft = 65536
+    return max(0, soft - FD_RESERVE)
+
+
+class ThreadSampler:
+    """Samples the threads of the process `pid`.
+
+    sample() returns a list of ThreadSample, one per live thread. Threads
+    which exit between samples are dropped and their files closed. Call
+    close() (or use the sampler as a context manager) when done.
+    """
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.task_dir = f"/proc/{pid}/task"
+        self.threads = {}  # tid -> _Thread
+        self.last_time = None
+        self.buffer = bytearray(BUFFER_SIZE)
+        self.view = memoryview(self.buffer)
+        self.last_sample_seconds = 0.0
+        self.max_kept_open = _raise_fd_limit() // 3
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for thread in self.threads.values():
+            thread.close()
+        self.threads.clear()
+
+    def _read(self, thread, which):
+        # Re-read a kept-open /proc file into the shared buffer, or open,
+        # read and close it for a thread without kept-open files.
+        if thread.fds is not None:
+            n = os.preadv(thread.fds[which], [self.buffer], 0)
+        else:
+            fd = os.open(thread.paths[which], os.O_RDONLY)
+            try:
+                n = os.preadv(fd, [self.buffer], 0)
+            finally:
+                os.close(fd)
+        # Slicing the memoryview rather than the bytearray copies once.
+        return bytes(self.view[:n])
+
+    def sample(self):
+        """Take one sample of every thread. Raises ProcessLookupError if
+        the process is gone."""
+        started = time.perf_counter()
+        try:
+            tids = os.listdir(self.task_dir)
+        except FileNotFoundError:
+            self.close()
+            raise ProcessLookupError(self.pid)
+        now = time.monotonic()
+        elapsed = None if self.last_time is None else now - self.last_time
+        self.last_time = now
+
+        live = {}
+        samples = []
+        kept_open = sum(1 for thread in self.threads.values() if thread.fds is not None)
+        for name in tids:
+            tid = int(name)
+            thread = self.threads.pop(tid, None)
+            try:
+                if thread is None:
+                    thread = _Thread(tid, self.task_dir, kept_open < self.max_kept_open)
+                    if thread.fds is not None:
+                        kept_open += 1
+                sample = self._sample_thread(thread, elapsed)
+            except (ProcessLookupError, FileNotFoundError):
+                # The thread exited between listdir() and the reads.
+                if thread is not None:
+                    thread.close()
+                continue
+            except OSError as e:
+                if e.errno not in (errno.EMFILE, errno.ENFILE):
+                    raise
+                # Out of descriptors for a thread read with open() each
+                # time: skip it this once, keeping its counters.
+                live[tid] = thread
+                continue
+            live[tid] = thread
+            samples.append(sample)
+
+        for thread in self.threads.values():  # Threads which exited.
+            thread.close()
+        self.threads = live
+        self.last_sample_seconds = time.perf_counter() - started
+        return samples
+
+    def _sample_thread(self, thread, elapsed):
+        stat = self._read(thread, STAT)
+        close = stat.rfind(b")")
+        name = stat[stat.find(b"(") + 1:close].decode("utf-8", "replace")
+        fields = stat[close + 2:].split()
+        state = fields[0].decode("ascii")
+        utime, stime = int(fields[11]), int(fields[12])
+
+        status = self._read(thread, STATUS)
+        voluntary = _field(status, b"voluntary_ctxt_switches:")
+        involuntary = _field(status, b"nonvoluntary_ctxt_switches:")
+
+        run_ns = wait_ns = None
+        if thread.has_schedstat:
+            run_ns, wait_ns = (int(value) for value in self._read(thread, SCHEDSTAT).split()[:2])
+
+        cpu_percent = user_percent = system_percent = wait_percent = None
+        voluntary_rate = involuntary_rate = None
+        if elapsed and thread.utime is not None:
+            user_percent = 100.0 * (utime - thread.utime) / CLOCK_TICKS / elapsed
+            system_percent = 100.0 * (stime - thread.stime) / CLOCK_TICKS / elapsed
+            if run_ns is not None:
+                # schedstat has ns resolution, stat only clock ticks.
+                cpu_percent = 100.0 * (run_ns - thread.run_ns) / 1e9 / elapsed
+                wait_percent = 100.0 * (wait_ns - thread.wait_ns) / 1e9 / elapsed
+            else:
+                cpu_percent = user_percent + system_percent
+            voluntary_rate = (voluntary - thread.voluntary) / elapsed
+            involuntary_rate = (involuntary - thread.involuntary) / elapsed
+
+        thread.utime, thread.stime = utime, stime
+        thread.run_ns, thread.wait_ns = run_ns, wait_ns
+        thread.voluntary, thread.involuntary = voluntary, involuntary
+
+        return ThreadSample(thread.tid, name, state,
+                            cpu_percent, user_percent, system_percent, wait_percent,
+                            voluntary_rate, involuntary_rate,
+                            (utime + stime) / CLOCK_TICKS, voluntary, involuntary)
+
+
+##
+#
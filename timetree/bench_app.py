@@ -0,0 +1,213 @@
+#! /usr/bin/env python3
+
+# Load and latency benchmark for the timetree FastAPI app.
+#
+# Runs the app in-process through httpx's ASGI transport, so no server,
+# ports or network are involved and the numbers measure the app itself
+# (routing, validation, handlers, cache and store). Drives
+# GET /items/{item_id} and PUT /items/{item_id} at each requested
+# concurrency level against two variants of the app:
+#
+#   async  the real app from main.py (async def handlers)
+#   sync   the same routes as plain def handlers, which FastAPI runs in
+#          its threadpool
+#
+# and reports throughput and p50/p95/p99 latency. Results are saved as
+# JSON under bench-results/ and can be compared against an earlier run
+# with --baseline to spot regressions between releases.
+#
+# Usage:
+#   python3 bench_app.py --requests 2000 --concurrency 1 10 50
+#   python3 bench_app.py --baseline bench-results/<earlier run>.json
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+
+import main
+from timetree.cache import ResponseCache, create_backend
+from timetree.storage import create_store
+
+
+RESULTS_DIR = "bench-results"
+
+# Item ids are drawn from this range, so GETs mix cache hits and misses
+# and PUTs keep invalidating some of the cached entries.
+ITEM_ID_RANGE = 1000
+
+
+def make_sync_app():
+    """Build the sync-handler variant of main.app: the same routes and
+    models, with plain def handlers and its own cache and store, of the
+    kinds TIMETREE_CACHE and TIMETREE_STORE select for main.app but with
+    blocking clients."""
+    app = FastAPI()
+    cache = ResponseCache(create_backend(asynchronous=False))
+    store = create_store(asynchronous=False)
+    app.state.cache = cache
+    app.state.store = store
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int, q: str = None):
+        return cache.get_or_set(f"/items/{item_id}", {"q": q},
+                                lambda: {"item_id": item_id, "q": q})
+
+    @app.put("/items/{item_id}")
+    def create_item(item_id: int, item: main.Item):
+        store.set_many({item_id: jsonable_encoder(item)})
+        cache.invalidate(f"/items/{item_id}")
+        return {"item_name": item.name, "item_id": item_id}
+
+    return app
+
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile of an already sorted list.
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def drive(client, method, total, concurrency):
+    """Send `total` requests with `concurrency` in flight and return the
+    throughput and latency summary."""
+    latencies = []
+    errors = 0
+    remaining = total
+    rng = random.Random(42)
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            item_id = rng.randrange(ITEM_ID_RANGE)
+            start = time.perf_counter()
+            if method == "GET":
+                response = await client.get(f"/items/{item_id}", params={"q": "bench"})
+            else:
+                response = await client.put(f"/items/{item_id}",
+                                            json={"name": f"item-{item_id}", "price": 9.99})
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput_rps": total / elapsed,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+async def run_variant(app, requests, concurrency_levels, warmup):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await drive(client, "PUT", warmup, 1)
+        await drive(client, "GET", warmup, 1)
+        results = []
+        for concurrency in concurrency_levels:
+            for method in ("PUT", "GET"):
+                result = await drive(client, method, requests, concurrency)
+                result.update(method=method, concurrency=concurrency)
+                results.append(result)
+    return results
+
+
+async def run(args):
+    results = {}
+    for variant in args.variants:
+        if variant == "async":
+            # The ASGI transport does not send lifespan events, so the
+            # store is opened and closed here.
+            await main.open_store()
+            try:
+                results[variant] = await run_variant(main.app, args.requests, args.concurrency, args.warmup)
+            finally:
+                await main.close_store()
+        else:
+            app = make_sync_app()
+            try:
+                results[variant] = await run_variant(app, args.requests, args.concurrency, args.warmup)
+            finally:
+                app.state.store.close()
+                await app.state.cache.close()
+    return results
+
+
+def print_results(results, baseline=None):
+    header = f"{'variant':<8}{'method':<8}{'conc':>6}{'req/s':>11}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"
+    if baseline:
+        header += f"{'req/s vs base':>15}"
+    print(header)
+    for variant, rows in results.items():
+        for row in rows:
+            line = (f"{variant:<8}{row['method']:<8}{row['concurrency']:>6}{row['throughput_rps']:>11.0f}"
+                    f"{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}{row['errors']:>8}")
+            if baseline:
+                base = next((b for b in baseline.get(variant, [])
+                             if b["method"] == row["method"] and b["concurrency"] == row["concurrency"]), None)
+                if base:
+                    change = (row["throughput_rps"] / base["throughput_rps"] - 1) * 100
+                    line += f"{change:>+14.1f}%"
+            print(line)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark the timetree FastAPI app in-process.")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per method and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50],
+                        help="concurrency levels to run")
+    parser.add_argument("--variants", nargs="+", choices=["async", "sync"], default=["async", "sync"])
+    parser.add_argument("--warmup", type=int, default=200, help="untimed requests before measuring")
+    parser.add_argument("--baseline", help="earlier results JSON file to compare throughput against")
+    parser.add_argument("--output", help=f"results JSON file (default: a new file in {RESULTS_DIR}/)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, time.strftime("bench-%Y%m%d-%H%M%S.json"))
+    with open(output, "w") as f:
+        json.dump({
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "store": os.environ.get("TIMETREE_STORE", "memory"),
+            "cache": os.environ.get("TIMETREE_CACHE", "memory"),
+            "params": {"requests": args.requests, "concurrency": args.concurrency, "warmup": args.warmup},
+            "results": results,
+        }, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
+
+##
+#
@@ -1,8 +1,22 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 
+from timetree.bulk import ndjson_batches
+from timetree.cache import ResponseCache, create_backend
+from timetree.storage import create_store
+
 app = FastAPI()
 
+# GET responses are cached by path and query parameters. The backend is
+# chosen with the TIMETREE_CACHE environment variable (see create_backend).
+cache = ResponseCache(create_backend())
+
+# Item storage, shared by all requests. Created at startup, so that its
+# connection pool lives as long as the app. The backend is chosen with the
+# TIMETREE_STORE environment variable (see create_store).
+store = None
+
 
 class Item(BaseModel):
     name: str
@@ -10,20 +24,95 @@ class Item(BaseModel):
     is_offer: bool = None
 
 
+@app.on_event("startup")
+async def open_store():
+    global store
+    store = create_store()
+
+
+@app.on_event("shutdown")
+async def close_store():
+    await store.close()
+    await cache.close()
+
+
+async def store_items(batch):
+    """Store a dict of item_id -> Item and drop their cached responses."""
+    await store.set_many({item_id: jsonable_encoder(item) for item_id, item in batch.items()})
+    await cache.invalidate_many_async([f"/items/{item_id}" for item_id in batch])
+
+
 @app.get("/")
-def read_root():
-    return {"Hello": "World"}
+async def read_root():
+    return await cache.get_or_set_async("/", None, lambda: {"Hello": "World"})
+
+
+@app.get("/items")
+async def read_items(ids: str):
+    """Fetch many stored items in one round trip to the store. ids is a
+    comma-separated list of item ids; unknown ids map to null."""
+    try:
+        item_ids = [int(item_id) for item_id in ids.split(",") if item_id.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    return {"items": await store.get_many(item_ids)}
 
 
 @app.get("/items/{item_id}")
-def read_item(item_id: int, q: str = None):
-    return {"item_id": item_id, "q": q}
+async def read_item(item_id: int, q: str = None):
+    return await cache.get_or_set_async(f"/items/{item_id}", {"q": q},
+                                        lambda: {"item_id": item_id, "q": q})
 
 
 @app.put("/items/{item_id}")
-def create_item(item_id: int, item: Item):
+async def create_item(item_id: int, item: Item):
+    await store_items({item_id: item})
     return {"item_name": item.name, "item_id": item_id}
 
 
+@app.post("/items/bulk")
+async def create_items_bulk(request: Request, batch_size: int = 1000):
+    """Create or replace many items from a streamed NDJSON body.
+
+    Each line is one JSON object holding an "item_id" and the Item fields,
+    e.g. {"item_id": 1, "name": "Foo", "price": 4.2}. The body is read,
+    validated and stored in batches of batch_size lines as it arrives,
+    without buffering it. The response lists, per batch, the number of
+    items stored and the line numbers and reasons of rejected lines.
+    """
+    batch_size = max(1, batch_size)
+    results = []
+    async for lines in ndjson_batches(request.stream(), batch_size):
+        valid = {}
+        rejected = []
+        for line_number, obj, error in lines:
+            if error is None:
+                try:
+                    if not isinstance(obj, dict):
+                        raise ValueError("expected a JSON object")
+                    fields = dict(obj)
+                    item_id = fields.pop("item_id")
+                    if isinstance(item_id, bool) or not isinstance(item_id, int):
+                        raise ValueError("item_id must be an integer")
+                    valid[item_id] = Item(**fields)
+                except KeyError:
+                    error = "missing item_id"
+                except (ValueError, TypeError) as e:
+                    error = str(e)
+            if error is not None:
+                rejected.append({"line": line_number, "error": error})
+        await store_items(valid)
+        results.append({"batch": len(results) + 1, "stored": len(valid),
+                        "rejected": rejected})
+    return {"stored": sum(result["stored"] for result in results),
+            "rejected": sum(len(result["rejected"]) for result in results),
+            "batches": results}
+
+
+@app.get("/cache/stats")
+async def read_cache_stats():
+    return cache.stats()
+
+
 ##
 #
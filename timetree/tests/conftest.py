@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The timetree package lives next to this directory; make it importable
+# however pytest is run (from the repository root or from timetree/).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
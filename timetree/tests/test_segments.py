@@ -0,0 +1,27 @@
+import tempfile
+import unittest
+
+from timetree.segments import SPARSE_EVERY, SegmentStore
+
+
+class SegmentRangeTest(unittest.TestCase):
+
+    def test_many_events_in_one_second(self):
+        # Keys have one-second resolution, so one key spans several sparse
+        # index blocks here.
+        t = 1700000000.0
+        count = 1000
+        self.assertGreater(count, SPARSE_EVERY)
+        timestamps = [t + i * 0.0009 for i in range(count)]
+        with tempfile.TemporaryDirectory() as directory:
+            with SegmentStore(directory) as store:
+                for ts in timestamps:
+                    store.append(ts, 1.0)
+                store.flush()
+                for start, end in ((t + 0.5, t + 2), (t + 0.1, t + 0.2), (t, t + 1), (t - 1, t + 0.0001)):
+                    expected = sum(1 for ts in timestamps if start <= ts < end)
+                    self.assertEqual(store.aggregate(start, end)[0], expected, (start - t, end - t))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,13 +1,161 @@
 #! /usr/bin/env python3
 
+import sys
+
+import numpy as np
+
+
+# Digits used for bases up to 62. They are in ASCII order, so keys of equal
+# width sort lexicographically in the same order as the numbers they encode.
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+MAX_BASE = len(DIGITS)
+
+_DIGIT_BYTES = np.frombuffer(DIGITS.encode("ascii"), dtype=np.uint8)
+
+# Per-base lookup tables for the batch functions, built on first use.
+_pair_tables = {}
+_power_tables = {}
+
+
+def _check_base(base):
+    if not 2 <= base <= MAX_BASE:
+        raise ValueError(f"base must be between 2 and {MAX_BASE}, not {base}")
 
 
 def zeropad_right(base, digits, index):
-    pass
+    """Return index written in the given base, right-aligned and padded
+    with zeros on the left to exactly `digits` characters.
+
+    Keys of the same base and width sort lexicographically in numeric
+    order, e.g. zeropad_right(10, 4, 42) == "0042".
+    """
+    _check_base(base)
+    if index < 0:
+        raise ValueError(f"index must not be negative, not {index}")
+    if index >= base ** digits:
+        raise ValueError(f"index {index} does not fit in {digits} "
+                         f"base-{base} digits")
+    chars = ["0"] * digits
+    pos = digits - 1
+    while index:
+        index, digit = divmod(index, base)
+        chars[pos] = DIGITS[digit]
+        pos -= 1
+    return "".join(chars)
+
+
+def digits_of_index(index, base=10):
+    """Return the number of base-`base` digits needed to write index.
+
+    This is the smallest `digits` value zeropad_right() accepts for index.
+    Zero needs one digit.
+    """
+    _check_base(base)
+    if index < 0:
+        raise ValueError(f"index must not be negative, not {index}")
+    digits = 1
+    while index >= base:
+        index //= base
+        digits += 1
+    return digits
+
+
+def _pair_table(base):
+    # All base * base two-digit combinations, so the batch encoder can
+    # emit two digits per division instead of one.
+    table = _pair_tables.get(base)
+    if table is None:
+        high, low = np.divmod(np.arange(base * base), base)
+        pairs = np.stack([_DIGIT_BYTES[high], _DIGIT_BYTES[low]], axis=1)
+        # Viewed as one uint16 per pair, a lookup is a single np.take.
+        table = np.ascontiguousarray(pairs).view(np.uint16).ravel()
+        _pair_tables[base] = table
+    return table
+
+
+def _power_table(base):
+    # base ** 1, base ** 2, ... for all powers that fit in a uint64.
+    table = _power_tables.get(base)
+    if table is None:
+        powers = []
+        power = base
+        while power < 2 ** 64:
+            powers.append(power)
+            power *= base
+        table = np.array(powers, dtype=np.uint64)
+        _power_tables[base] = table
+    return table
+
+
+def _as_indices(indices):
+    indices = np.asarray(indices)
+    if indices.size == 0:
+        # np.asarray([]) is float64; an empty input has no wrong-typed items.
+        return indices.astype(np.uint64)
+    if indices.dtype.kind not in "iu":
+        raise TypeError(f"indices must be an integer array, not {indices.dtype}")
+    if indices.dtype.kind == "i" and indices.size and indices.min() < 0:
+        raise ValueError("indices must not be negative")
+    return indices.astype(np.uint64, copy=False)
+
+
+def zeropad_right_batch(base, digits, indices):
+    """Vectorized zeropad_right() for an integer array of indices.
+
+    Returns a NumPy bytes array (dtype "S<digits>") of the same shape, one
+    fixed-width ASCII key per index. The keys are built with integer math
+    on whole arrays and a two-digit lookup table, with no per-item string
+    formatting. Memory use is about `digits` bytes plus a few words per
+    index, so very large runs should be generated in chunks.
+    """
+    _check_base(base)
+    indices = _as_indices(indices)
+    if digits < 1:
+        raise ValueError(f"digits must be at least 1, not {digits}")
+    if indices.size and digits_of_index(int(indices.max()), base) > digits:
+        raise ValueError(f"largest index {int(indices.max())} does not fit "
+                         f"in {digits} base-{base} digits")
+
+    flat = indices.ravel()
+    out = np.empty((flat.size, digits), dtype=np.uint8)
+    if digits > len(_power_table(base)):
+        # Digits beyond what a uint64 can reach are always zero.
+        lead = digits - len(_power_table(base)) - 1
+        out[:, :lead] = _DIGIT_BYTES[0]
+    else:
+        lead = 0
+
+    table = _pair_table(base)
+    pair_base = np.uint64(base * base)
+    single_base = np.uint64(base)
+    rest = flat
+    pos = digits
+    while pos - 2 >= lead:
+        quotient = rest // pair_base
+        pair = rest - quotient * pair_base
+        out[:, pos - 2:pos] = np.take(table, pair).view(np.uint8).reshape(-1, 2)
+        rest = quotient
+        pos -= 2
+    if pos > lead:
+        out[:, lead] = _DIGIT_BYTES[rest % single_base]
+
+    return out.view(f"S{digits}").reshape(indices.shape)
+
+
+def digits_of_index_batch(indices, base=10):
+    """Vectorized digits_of_index() for an integer array of indices.
+
+    Returns an integer array of the same shape. Uses a binary search over
+    the powers of base, so it is exact for the full uint64 range.
+    """
+    _check_base(base)
+    indices = _as_indices(indices)
+    return np.searchsorted(_power_table(base), indices, side="right") + 1
 
-def digits_of_index(index):
-    pass
 
+# Imported last, since the tree module builds its keys with the functions
+# above.
+from .tree import LEVELS, Bucket, BucketStats, TimeTree  # noqa: E402
 
 
 if __name__ == '__main__':
@@ -0,0 +1,64 @@
+#! /usr/bin/env python3
+
+import json
+
+
+# A line longer than this is rejected instead of being buffered further,
+# so a body without newlines cannot make the server hold all of it.
+MAX_LINE_BYTES = 1 << 20
+
+
+async def ndjson_batches(chunks, batch_size):
+    """Split an async iterable of byte chunks into NDJSON lines and yield
+    them in batches.
+
+    Each batch is a list of (line_number, obj, error) tuples, where obj is
+    the decoded JSON value, or None when error holds the reason the line
+    was rejected. Blank lines are skipped. Only the current batch and one
+    partial line are held in memory, however large the body is.
+    """
+    batch = []
+    pending = b""
+    line_number = 0
+    skipping = False  # Inside an over-long line, discarding until newline.
+
+    def decode(line):
+        try:
+            return json.loads(line), None
+        except ValueError as e:
+            return None, f"invalid JSON: {e}"
+
+    async for chunk in chunks:
+        pending += chunk
+        start = 0
+        while True:
+            end = pending.find(b"\n", start)
+            if end < 0:
+                break
+            line = pending[start:end]
+            start = end + 1
+            line_number += 1
+            if skipping:
+                skipping = False
+                continue
+            if line.strip():
+                batch.append((line_number, *decode(line)))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        pending = pending[start:]
+        if len(pending) > MAX_LINE_BYTES:
+            if not skipping:
+                batch.append((line_number + 1, None, f"line longer than {MAX_LINE_BYTES} bytes"))
+                skipping = True
+            pending = b""
+
+    if pending.strip() and not skipping:
+        line_number += 1
+        batch.append((line_number, *decode(pending)))
+    if batch:
+        yield batch
+
+
+##
+#
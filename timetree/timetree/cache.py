@@ -0,0 +1,336 @@
+#! /usr/bin/env python3
+
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+
+# Returned by backends on a miss, since None is a valid cached value.
+MISS = object()
+
+
+class MemoryBackend:
+    """In-process LRU cache with a time-to-live per entry.
+
+    Holds at most `maxsize` entries; adding one more evicts the least
+    recently used. Entries older than `ttl` seconds are dropped when they
+    are next looked up. Entries are grouped by path, so invalidate(path)
+    drops every cached variant of a path (e.g. all query strings). Safe
+    to share between the threads FastAPI runs plain def handlers in, and
+    fast enough to call from async handlers directly.
+    """
+
+    asynchronous = False
+
+    def __init__(self, maxsize=1024, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (path, expires, value)
+        self._paths = {}  # path -> set of keys
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _drop(self, key):
+        path, _, _ = self._entries.pop(key)
+        keys = self._paths[path]
+        keys.discard(key)
+        if not keys:
+            del self._paths[path]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            if entry[1] <= time.monotonic():
+                self._drop(key)
+                return MISS
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, path, key, value):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (path, time.monotonic() + self.ttl, value)
+            self._paths.setdefault(path, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, path):
+        with self._lock:
+            for key in list(self._paths.get(path, ())):
+                self._drop(key)
+
+    def invalidate_many(self, paths):
+        with self._lock:
+            for path in paths:
+                for key in list(self._paths.get(path, ())):
+                    self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._paths.clear()
+
+    def stats(self):
+        return {"backend": "memory", "size": len(self._entries),
+                "maxsize": self.maxsize, "evictions": self.evictions}
+
+
+class RedisBackend:
+    """Cache backend storing JSON-encoded entries in Redis.
+
+    Takes a redis-py client (or a FakeRedis). Redis expires entries after
+    `ttl` seconds and bounds memory with its own maxmemory/eviction policy.
+    The keys cached for each path are kept in a Redis set so invalidate()
+    can find them without scanning the keyspace. Every call blocks on the
+    network, so use AsyncRedisBackend from async handlers.
+    """
+
+    asynchronous = False
+
+    def __init__(self, client, ttl=60, prefix="timetree:cache:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, max_connections=50, **kwargs):
+        import redis
+        pool = redis.ConnectionPool.from_url(url, max_connections=max_connections)
+        return cls(redis.Redis(connection_pool=pool), **kwargs)
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return MISS if raw is None else json.loads(raw)
+
+    def set(self, path, key, value):
+        path_key = f"{self.prefix}path:{path}"
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+        pipe.sadd(path_key, key)
+        pipe.expire(path_key, self.ttl)
+        pipe.execute()
+
+    def invalidate(self, path):
+        path_key = f"{self.prefix}path:{path}"
+        keys = [self.prefix + key.decode("utf-8") for key in self.client.smembers(path_key)]
+        self.client.delete(*keys, path_key)
+
+    def invalidate_many(self, paths):
+        # Two round trips for any number of paths: one pipeline reading
+        # every path's key set, then one DELETE of all of them.
+        path_keys = [f"{self.prefix}path:{path}" for path in paths]
+        if not path_keys:
+            return
+        pipe = self.client.pipeline()
+        for path_key in path_keys:
+            pipe.smembers(path_key)
+        keys = [self.prefix + key.decode("utf-8") for members in pipe.execute() for key in members]
+        self.client.delete(*keys, *path_keys)
+
+    def clear(self):
+        keys = self.client.keys(self.prefix + "*")
+        if keys:
+            self.client.delete(*keys)
+
+    def close(self):
+        self.client.close()
+        pool = getattr(self.client, "connection_pool", None)
+        if pool is not None:
+            pool.disconnect()
+
+    def stats(self):
+        return {"backend": "redis", "ttl": self.ttl}
+
+
+class AsyncRedisBackend:
+    """RedisBackend for async handlers, on a redis.asyncio client (or a
+    FakeAsyncRedis): the same keys and layout, with every call a coroutine
+    so that a cache lookup never blocks the event loop."""
+
+    asynchronous = True
+
+    def __init__(self, client, ttl=60, prefix="timetree:cache:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, max_connections=50, **kwargs):
+        import redis.asyncio
+        pool = redis.asyncio.ConnectionPool.from_url(url, max_connections=max_connections)
+        return cls(redis.asyncio.Redis(connection_pool=pool), **kwargs)
+
+    async def get(self, key):
+        raw = await self.client.get(self.prefix + key)
+        return MISS if raw is None else json.loads(raw)
+
+    async def set(self, path, key, value):
+        path_key = f"{self.prefix}path:{path}"
+        pipe = self.client.pipeline(transaction=False)
+        pipe.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+        pipe.sadd(path_key, key)
+        pipe.expire(path_key, self.ttl)
+        await pipe.execute()
+
+    async def invalidate(self, path):
+        path_key = f"{self.prefix}path:{path}"
+        keys = [self.prefix + key.decode("utf-8") for key in await self.client.smembers(path_key)]
+        await self.client.delete(*keys, path_key)
+
+    async def invalidate_many(self, paths):
+        path_keys = [f"{self.prefix}path:{path}" for path in paths]
+        if not path_keys:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        for path_key in path_keys:
+            pipe.smembers(path_key)
+        keys = [self.prefix + key.decode("utf-8") for members in await pipe.execute() for key in members]
+        await self.client.delete(*keys, *path_keys)
+
+    async def clear(self):
+        keys = await self.client.keys(self.prefix + "*")
+        if keys:
+            await self.client.delete(*keys)
+
+    async def close(self):
+        close = getattr(self.client, "aclose", None) or self.client.close
+        await close()
+        pool = getattr(self.client, "connection_pool", None)
+        if pool is not None:
+            await pool.disconnect()
+
+    def stats(self):
+        return {"backend": "redis", "ttl": self.ttl}
+
+
+def create_backend(kind=None, asynchronous=True):
+    """Create the cache backend selected by `kind` or, by default, by the
+    TIMETREE_CACHE environment variable: "memory" (the default), "redis"
+    (the server at REDIS_URL, by default the redis service of
+    timetree.yml, with up to REDIS_MAX_CONNECTIONS pooled connections) or
+    "fakeredis" (an in-process Redis stand-in). The Redis backends are
+    asynchronous, for the async handlers of main.py, unless asynchronous
+    is false."""
+    kind = kind or os.environ.get("TIMETREE_CACHE", "memory")
+    ttl = float(os.environ.get("TIMETREE_CACHE_TTL", "60"))
+    if kind == "memory":
+        return MemoryBackend(maxsize=int(os.environ.get("TIMETREE_CACHE_SIZE", "1024")), ttl=ttl)
+    # Redis expires in whole seconds. Round up, so that a sub-second TTL
+    # still caches instead of becoming 0 (which Redis rejects).
+    ttl = math.ceil(ttl)
+    if kind == "redis":
+        backend = AsyncRedisBackend if asynchronous else RedisBackend
+        return backend.from_url(os.environ.get("REDIS_URL", "redis://redis:6379/0"),
+                                max_connections=int(os.environ.get("REDIS_MAX_CONNECTIONS", "50")),
+                                ttl=ttl)
+    if kind == "fakeredis":
+        from .fakeredis import FakeAsyncRedis, FakeRedis
+        if asynchronous:
+            return AsyncRedisBackend(FakeAsyncRedis(), ttl=ttl)
+        return RedisBackend(FakeRedis(), ttl=ttl)
+    raise ValueError(f"Unknown cache backend: {kind}")
+
+
+class ResponseCache:
+    """Caches responses by request path and query parameters and counts
+    hits and misses. Storage is delegated to a pluggable backend."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(path, params=None):
+        # Parameters left at None are the same request as leaving them
+        # out, and their order in the URL does not matter.
+        if not params:
+            return path
+        query = urlencode(sorted((name, value) for name, value in params.items() if value is not None))
+        return f"{path}?{query}" if query else path
+
+    def get_or_set(self, path, params, compute):
+        """Return the cached response for path and params, or call
+        compute() and cache what it returns."""
+        key = self.key(path, params)
+        value = self.backend.get(key)
+        if value is not MISS:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = compute()
+        self.backend.set(path, key, value)
+        return value
+
+    def invalidate(self, path):
+        """Drop every cached response for path, whatever its parameters."""
+        self.backend.invalidate(path)
+
+    def invalidate_many(self, paths):
+        """Drop every cached response for each of paths, in as few round
+        trips to the backend as it allows."""
+        self.backend.invalidate_many(paths)
+
+    def clear(self):
+        self.backend.clear()
+
+    # The same for async handlers. These work with either kind of backend
+    # and await the backend's calls when it is asynchronous.
+
+    async def get_or_set_async(self, path, params, compute):
+        key = self.key(path, params)
+        value = self.backend.get(key)
+        if self.backend.asynchronous:
+            value = await value
+        if value is not MISS:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = compute()
+        if self.backend.asynchronous:
+            await self.backend.set(path, key, value)
+        else:
+            self.backend.set(path, key, value)
+        return value
+
+    async def invalidate_async(self, path):
+        if self.backend.asynchronous:
+            await self.backend.invalidate(path)
+        else:
+            self.backend.invalidate(path)
+
+    async def invalidate_many_async(self, paths):
+        if self.backend.asynchronous:
+            await self.backend.invalidate_many(paths)
+        else:
+            self.backend.invalidate_many(paths)
+
+    async def close(self):
+        close = getattr(self.backend, "close", None)
+        if close is None:
+            return
+        if self.backend.asynchronous:
+            await close()
+        else:
+            close()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                **self.backend.stats()}
+
+
+##
+#
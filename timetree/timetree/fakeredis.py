@@ -0,0 +1,159 @@
+#! /usr/bin/env python3
+
+import fnmatch
+import time
+
+
+class FakeRedis:
+    """In-memory stand-in for a redis-py client, for tests and for running
+    without a Redis server.
+
+    Implements only the commands timetree uses, with redis-py's calling
+    conventions: values are stored as bytes, expiry is honoured on access
+    and pipeline() queues commands until execute().
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+
+    def _alive(self, name):
+        expires = self._expires.get(name)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(name, None)
+            del self._expires[name]
+        return name in self._data
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, bytes):
+            return value
+        return str(value).encode("utf-8")
+
+    def get(self, name):
+        return self._data[name] if self._alive(name) else None
+
+    def mget(self, names, *args):
+        names = [names, *args] if isinstance(names, (str, bytes)) else list(names)
+        return [self.get(name) for name in names]
+
+    def set(self, name, value, ex=None):
+        self._data[name] = self._encode(value)
+        self._expires.pop(name, None)
+        if ex is not None:
+            self.expire(name, ex)
+        return True
+
+    def mset(self, mapping):
+        for name, value in mapping.items():
+            self.set(name, value)
+        return True
+
+    def delete(self, *names):
+        deleted = 0
+        for name in names:
+            if self._alive(name):
+                del self._data[name]
+                self._expires.pop(name, None)
+                deleted += 1
+        return deleted
+
+    def expire(self, name, seconds):
+        if not self._alive(name):
+            return False
+        self._expires[name] = time.monotonic() + seconds
+        return True
+
+    def sadd(self, name, *values):
+        members = self._data.get(name) if self._alive(name) else None
+        if members is None:
+            members = self._data[name] = set()
+        before = len(members)
+        members.update(self._encode(value) for value in values)
+        return len(members) - before
+
+    def smembers(self, name):
+        return set(self._data[name]) if self._alive(name) else set()
+
+    def keys(self, pattern="*"):
+        return [name.encode("utf-8") for name in list(self._data)
+                if self._alive(name) and fnmatch.fnmatchcase(name, pattern)]
+
+    def flushdb(self):
+        self._data.clear()
+        self._expires.clear()
+        return True
+
+    def ping(self):
+        return True
+
+    def close(self):
+        pass
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Queues commands for a FakeRedis and runs them on execute()."""
+
+    def __init__(self, client):
+        self._client = client
+        self._commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._commands = []
+
+    def __getattr__(self, command):
+        method = getattr(self._client, command)
+
+        def queue(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        commands, self._commands = self._commands, []
+        return [method(*args, **kwargs) for method, args, kwargs in commands]
+
+
+class FakeAsyncRedis:
+    """Asyncio flavour of FakeRedis, mirroring redis.asyncio.Redis: every
+    command is a coroutine, except that pipeline() returns a pipeline
+    whose commands queue synchronously and whose execute() is awaited."""
+
+    def __init__(self):
+        self.sync = FakeRedis()
+
+    def __getattr__(self, command):
+        method = getattr(self.sync, command)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+    async def aclose(self):
+        pass
+
+    def pipeline(self, transaction=True):
+        return FakeAsyncPipeline(self.sync)
+
+
+class FakeAsyncPipeline(FakePipeline):
+    """Queues commands for a FakeAsyncRedis; execute() is awaited."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self._commands = []
+
+    async def execute(self):
+        return FakePipeline.execute(self)
+
+
+##
+#
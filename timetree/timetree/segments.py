@@ -0,0 +1,203 @@
+#! /usr/bin/env python3
+
+import bisect
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+from . import zeropad_right
+
+
+# A segment file is a 16-byte header followed by fixed-size records sorted
+# by key, then timestamp. The key is the event's UTC time down to the
+# second as zero-padded digits ("YYYYMMDDhhmmss"), so segments sort and
+# search the same way as the TimeTree bucket keys they extend.
+MAGIC = b"TTSEG001"
+HEADER = struct.Struct("<8sQ")  # magic, record count
+KEY_SIZE = 14
+RECORD = struct.Struct(f"<{KEY_SIZE}s2xdd")  # key, padding, timestamp, value
+RECORD_DTYPE = np.dtype([("key", f"S{KEY_SIZE}"), ("pad", "V2"),
+                         ("ts", "<f8"), ("value", "<f8")])
+assert RECORD_DTYPE.itemsize == RECORD.size
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".tts"
+
+# Every SPARSE_EVERY-th record's (key, timestamp) of a segment is kept in
+# memory. A lookup bisects those and then searches a single block in the
+# mapped file. The timestamp is needed because keys have one-second
+# resolution: a busy second can span many blocks.
+SPARSE_EVERY = 128
+
+
+def event_key(timestamp):
+    """Return the 14-byte segment key of a Unix timestamp."""
+    t = time.gmtime(timestamp)
+    return "".join((zeropad_right(10, 4, t.tm_year), zeropad_right(10, 2, t.tm_mon),
+                    zeropad_right(10, 2, t.tm_mday), zeropad_right(10, 2, t.tm_hour),
+                    zeropad_right(10, 2, t.tm_min), zeropad_right(10, 2, t.tm_sec))).encode("ascii")
+
+
+def as_array(view):
+    """Return a structured NumPy array (RECORD_DTYPE) over a memoryview of
+    records, without copying them."""
+    return np.frombuffer(view, dtype=RECORD_DTYPE)
+
+
+class Segment:
+    """A read-only, memory-mapped segment file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or len(self._map) != HEADER.size + self.count * RECORD.size:
+            self._map.close()
+            raise ValueError(f"{path} is not a valid segment file")
+        self.records = memoryview(self._map)[HEADER.size:]
+        self._sparse = [(self._key(i), self._ts(i)) for i in range(0, self.count, SPARSE_EVERY)]
+
+    def _key(self, i):
+        offset = HEADER.size + i * RECORD.size
+        return self._map[offset:offset + KEY_SIZE]
+
+    def _ts(self, i):
+        return struct.unpack_from("<d", self._map, HEADER.size + i * RECORD.size + 16)[0]
+
+    @property
+    def first_key(self):
+        return self._sparse[0][0] if self.count else None
+
+    @property
+    def last_key(self):
+        return self._key(self.count - 1) if self.count else None
+
+    def lower_bound(self, key, timestamp):
+        """Return the index of the first record at or after (key, timestamp)."""
+        block = bisect.bisect_left(self._sparse, (key, timestamp))
+        lo = max(block - 1, 0) * SPARSE_EVERY
+        hi = min(block * SPARSE_EVERY, self.count)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_key = self._key(mid)
+            if mid_key < key or (mid_key == key and self._ts(mid) < timestamp):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def range(self, start, end):
+        """Return a memoryview of the records with start <= timestamp < end.
+        The view points into the mapped file; nothing is copied."""
+        lo = self.lower_bound(event_key(start), start)
+        hi = self.lower_bound(event_key(end), end)
+        return self.records[lo * RECORD.size:hi * RECORD.size]
+
+    def close(self):
+        self.records.release()
+        self._map.close()
+
+
+class SegmentStore:
+    """Append-only event storage in a directory of segment files.
+
+    Appended events are buffered in memory and written out, sorted, as a
+    new immutable segment once `flush_every` of them have arrived or on
+    flush(). Opening a store only maps the existing segments and samples
+    their sparse indexes; nothing is loaded or re-sorted. Range reads
+    return memoryviews into the mapped files, one per segment, which
+    as_array() turns into NumPy arrays without copying; they must be
+    dropped before close() unmaps the files. Events still in the buffer
+    are not visible to reads and are lost on a crash, so call flush() at
+    points where durability matters.
+    """
+
+    def __init__(self, directory, flush_every=65536):
+        self.directory = directory
+        self.flush_every = flush_every
+        os.makedirs(directory, exist_ok=True)
+        names = sorted(name for name in os.listdir(directory)
+                       if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX))
+        self.segments = [Segment(os.path.join(directory, name)) for name in names]
+        self._next_seq = (int(names[-1][len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]) + 1) if names else 0
+        self._buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return sum(segment.count for segment in self.segments)
+
+    def append(self, timestamp, value):
+        self._buffer.append((event_key(timestamp), timestamp, value))
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered events out as a new segment."""
+        if not self._buffer:
+            return
+        self._buffer.sort()
+        data = bytearray(HEADER.size + len(self._buffer) * RECORD.size)
+        HEADER.pack_into(data, 0, MAGIC, len(self._buffer))
+        offset = HEADER.size
+        for record in self._buffer:
+            RECORD.pack_into(data, offset, *record)
+            offset += RECORD.size
+
+        name = f"{SEGMENT_PREFIX}{zeropad_right(10, 8, self._next_seq)}{SEGMENT_SUFFIX}"
+        path = os.path.join(self.directory, name)
+        # Written under a temporary name and renamed, so a crash never
+        # leaves a partial segment behind under a segment name.
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+        self.segments.append(Segment(path))
+        self._next_seq += 1
+        self._buffer = []
+
+    def range(self, start, end):
+        """Return a list of memoryviews of the records with start <=
+        timestamp < end, one per segment holding any. Each view is sorted;
+        views from different segments may interleave in time."""
+        start_key, end_key = event_key(start), event_key(end)
+        views = []
+        for segment in self.segments:
+            if not segment.count or segment.last_key < start_key or segment.first_key > end_key:
+                continue
+            view = segment.range(start, end)
+            if len(view):
+                views.append(view)
+        return views
+
+    def aggregate(self, start, end):
+        """Return (count, min, max, sum) of the values with start <=
+        timestamp < end, computed on the mapped records with NumPy."""
+        count, low, high, total = 0, None, None, 0.0
+        for view in self.range(start, end):
+            values = as_array(view)["value"]
+            count += len(values)
+            total += float(values.sum())
+            low = float(values.min()) if low is None else min(low, float(values.min()))
+            high = float(values.max()) if high is None else max(high, float(values.max()))
+        return count, low, high, total
+
+    def close(self):
+        self.flush()
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+
+##
+#
@@ -0,0 +1,149 @@
+#! /usr/bin/env python3
+
+import json
+import os
+
+
+class MemoryItemStore:
+    """Item storage in a dict, for running without Redis."""
+
+    def __init__(self):
+        self._items = {}
+
+    async def get(self, item_id):
+        return self._items.get(item_id)
+
+    async def get_many(self, item_ids):
+        return {item_id: self._items.get(item_id) for item_id in item_ids}
+
+    async def set(self, item_id, item):
+        self._items[item_id] = item
+
+    async def set_many(self, items):
+        self._items.update(items)
+
+    async def close(self):
+        pass
+
+
+class RedisItemStore:
+    """Item storage in Redis through an asyncio client.
+
+    Items are stored as JSON under "<prefix><item_id>". The client holds a
+    connection pool, so one store is created at startup and shared by all
+    requests. get_many() and set_many() cost one round trip however many
+    items they handle, using MGET and a non-transactional pipeline.
+    """
+
+    def __init__(self, client, prefix="timetree:item:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, max_connections=50, **kwargs):
+        import redis.asyncio
+        pool = redis.asyncio.ConnectionPool.from_url(url, max_connections=max_connections)
+        return cls(redis.asyncio.Redis(connection_pool=pool), **kwargs)
+
+    async def get(self, item_id):
+        raw = await self.client.get(f"{self.prefix}{item_id}")
+        return None if raw is None else json.loads(raw)
+
+    async def get_many(self, item_ids):
+        item_ids = list(item_ids)
+        if not item_ids:
+            return {}
+        raws = await self.client.mget([f"{self.prefix}{item_id}" for item_id in item_ids])
+        return {item_id: None if raw is None else json.loads(raw)
+                for item_id, raw in zip(item_ids, raws)}
+
+    async def set(self, item_id, item):
+        await self.client.set(f"{self.prefix}{item_id}", json.dumps(item))
+
+    async def set_many(self, items):
+        if not items:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        for item_id, item in items.items():
+            pipe.set(f"{self.prefix}{item_id}", json.dumps(item))
+        await pipe.execute()
+
+    async def close(self):
+        close = getattr(self.client, "aclose", None) or self.client.close
+        await close()
+        # A pool passed in to the client is not closed along with it.
+        pool = getattr(self.client, "connection_pool", None)
+        if pool is not None:
+            await pool.disconnect()
+
+
+class SyncItemStore:
+    """Blocking item storage for plain def handlers: in a dict or, given a
+    redis-py client (or a FakeRedis), in Redis under the same keys as
+    RedisItemStore."""
+
+    def __init__(self, client=None, prefix="timetree:item:"):
+        self.client = client
+        self.prefix = prefix
+        self._items = {}
+
+    @classmethod
+    def from_url(cls, url, max_connections=50, **kwargs):
+        import redis
+        pool = redis.ConnectionPool.from_url(url, max_connections=max_connections)
+        return cls(redis.Redis(connection_pool=pool), **kwargs)
+
+    def get_many(self, item_ids):
+        item_ids = list(item_ids)
+        if self.client is None:
+            return {item_id: self._items.get(item_id) for item_id in item_ids}
+        if not item_ids:
+            return {}
+        raws = self.client.mget([f"{self.prefix}{item_id}" for item_id in item_ids])
+        return {item_id: None if raw is None else json.loads(raw)
+                for item_id, raw in zip(item_ids, raws)}
+
+    def set_many(self, items):
+        if self.client is None:
+            self._items.update(items)
+            return
+        if not items:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        for item_id, item in items.items():
+            pipe.set(f"{self.prefix}{item_id}", json.dumps(item))
+        pipe.execute()
+
+    def close(self):
+        if self.client is None:
+            return
+        self.client.close()
+        pool = getattr(self.client, "connection_pool", None)
+        if pool is not None:
+            pool.disconnect()
+
+
+def create_store(kind=None, asynchronous=True):
+    """Create the item store selected by `kind` or, by default, by the
+    TIMETREE_STORE environment variable: "memory" (the default), "redis"
+    (the server at REDIS_URL, by default the redis service of
+    timetree.yml, with up to REDIS_MAX_CONNECTIONS pooled connections) or
+    "fakeredis" (an in-process Redis stand-in). The store is asynchronous,
+    for the async handlers of main.py, unless asynchronous is false."""
+    kind = kind or os.environ.get("TIMETREE_STORE", "memory")
+    if kind == "memory":
+        return MemoryItemStore() if asynchronous else SyncItemStore()
+    if kind == "redis":
+        store = RedisItemStore if asynchronous else SyncItemStore
+        return store.from_url(os.environ.get("REDIS_URL", "redis://redis:6379/0"),
+                              max_connections=int(os.environ.get("REDIS_MAX_CONNECTIONS", "50")))
+    if kind == "fakeredis":
+        from .fakeredis import FakeAsyncRedis, FakeRedis
+        if asynchronous:
+            return RedisItemStore(FakeAsyncRedis())
+        return SyncItemStore(FakeRedis())
+    raise ValueError(f"Unknown item store: {kind}")
+
+
+##
+#
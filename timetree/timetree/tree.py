@@ -0,0 +1,228 @@
+#! /usr/bin/env python3
+
+import bisect
+import calendar
+import time
+
+from . import zeropad_right
+
+
+# Bucket levels from coarsest to finest, with the number of decimal digits
+# each one adds to a bucket key. A minute bucket's key is the year, month,
+# day, hour and minute of its start (UTC), e.g. "202610191530", and every
+# coarser bucket's key is a prefix of it.
+LEVELS = ("year", "month", "day", "hour", "minute")
+LEVEL_WIDTHS = (4, 2, 2, 2, 2)
+LEAF = len(LEVELS) - 1
+
+# Sorts after every digit, so parent_key + _PREFIX_END is an upper bound
+# for the keys of all of parent_key's children.
+_PREFIX_END = ":"
+
+
+def bucket_keys(timestamp):
+    """Return the keys of the year, month, day, hour and minute buckets
+    holding a Unix timestamp, coarsest first."""
+    t = time.gmtime(timestamp)
+    parts = (t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min)
+    keys = []
+    key = ""
+    for part, width in zip(parts, LEVEL_WIDTHS):
+        key += zeropad_right(10, width, part)
+        keys.append(key)
+    return keys
+
+
+def bucket_span(key):
+    """Return the (start, end) Unix timestamps of the bucket with the given
+    key. The end is exclusive."""
+    level = len(LEVEL_WIDTHS) - 1
+    while sum(LEVEL_WIDTHS[:level + 1]) != len(key):
+        level -= 1
+    year = int(key[0:4])
+    month = int(key[4:6]) if level >= 1 else 1
+    day = int(key[6:8]) if level >= 2 else 1
+    hour = int(key[8:10]) if level >= 3 else 0
+    minute = int(key[10:12]) if level >= 4 else 0
+    start = calendar.timegm((year, month, day, hour, minute, 0))
+    if level == 0:
+        end = calendar.timegm((year + 1, 1, 1, 0, 0, 0))
+    elif level == 1:
+        end = calendar.timegm((year + month // 12, month % 12 + 1, 1, 0, 0, 0))
+    else:
+        end = start + (86400, 3600, 60)[level - 2]
+    return start, end
+
+
+class BucketStats:
+    """Running count, min, max and sum of a set of values."""
+
+    __slots__ = ("count", "min", "max", "sum")
+
+    def __init__(self):
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.sum = 0.0
+
+    def add(self, value):
+        if self.count == 0:
+            self.min = self.max = value
+        elif value < self.min:
+            self.min = value
+        elif value > self.max:
+            self.max = value
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.min, self.max = other.min, other.max
+        else:
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.count += other.count
+        self.sum += other.sum
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def as_dict(self):
+        return {"count": self.count, "min": self.min, "max": self.max,
+                "sum": self.sum, "mean": self.mean}
+
+
+class Bucket(BucketStats):
+    """Aggregates of one time bucket. Minute buckets also keep their
+    events, as parallel lists of timestamps and values in time order."""
+
+    __slots__ = ("key", "start", "end", "times", "values")
+
+    def __init__(self, key, leaf):
+        super().__init__()
+        self.key = key
+        self.start, self.end = bucket_span(key)
+        self.times = [] if leaf else None
+        self.values = [] if leaf else None
+
+
+class TimeTree:
+    """Hierarchical index of events in year, month, day, hour and minute
+    buckets.
+
+    Every level keeps a dict of its buckets by key and a sorted list of
+    those keys, so a bucket is found in O(1) and the buckets of a time
+    range in O(log n). Each insert updates the count/min/max/sum of the
+    five buckets holding the event, so range aggregates are assembled from
+    whole buckets wherever the range covers them and only the buckets at
+    the two ends of the range are descended into.
+
+    Inserts in time order are O(1) amortized: the event lands in the
+    current minute or appends a new bucket key and event. An out-of-order
+    insert is a list insert, O(k) in the number of later keys at each
+    level and of later events in its minute.
+    """
+
+    def __init__(self):
+        self._buckets = [{} for _ in LEVELS]
+        self._keys = [[] for _ in LEVELS]
+        # Events mostly arrive in bursts within the same minute, so the
+        # buckets of the last insert are kept to skip the key computation.
+        self._last_start = None
+        self._last_end = None
+        self._last_path = None
+
+    def __len__(self):
+        return sum(bucket.count for bucket in self._buckets[0].values())
+
+    def _bucket(self, level, key):
+        bucket = self._buckets[level].get(key)
+        if bucket is None:
+            bucket = Bucket(key, level == LEAF)
+            self._buckets[level][key] = bucket
+            bisect.insort(self._keys[level], key)
+        return bucket
+
+    def insert(self, timestamp, value=1.0):
+        """Add an event with a numeric value at a Unix timestamp."""
+        if self._last_path is not None and self._last_start <= timestamp < self._last_end:
+            path = self._last_path
+        else:
+            path = [self._bucket(level, key)
+                    for level, key in enumerate(bucket_keys(timestamp))]
+            self._last_path = path
+            self._last_start, self._last_end = path[LEAF].start, path[LEAF].end
+
+        for bucket in path:
+            bucket.add(value)
+
+        leaf = path[LEAF]
+        if not leaf.times or timestamp >= leaf.times[-1]:
+            leaf.times.append(timestamp)
+            leaf.values.append(value)
+        else:
+            pos = bisect.bisect_right(leaf.times, timestamp)
+            leaf.times.insert(pos, timestamp)
+            leaf.values.insert(pos, value)
+
+    def _key_range(self, level, parent_key, start, end):
+        # Index range in self._keys[level] of the children of parent_key
+        # which may overlap [start, end).
+        keys = self._keys[level]
+        lo = bisect.bisect_left(keys, max(parent_key, bucket_keys(start)[level]))
+        hi = bisect.bisect_right(keys, bucket_keys(end)[level])
+        if parent_key:
+            hi = min(hi, bisect.bisect_left(keys, parent_key + _PREFIX_END, lo))
+        return lo, hi
+
+    def aggregate(self, start, end):
+        """Return the BucketStats of all events in [start, end)."""
+        result = BucketStats()
+        if start < end:
+            self._aggregate(0, "", start, end, result)
+        return result
+
+    def _aggregate(self, level, parent_key, start, end, result):
+        keys = self._keys[level]
+        buckets = self._buckets[level]
+        lo, hi = self._key_range(level, parent_key, start, end)
+        for i in range(lo, hi):
+            bucket = buckets[keys[i]]
+            if bucket.end <= start or bucket.start >= end:
+                continue
+            if start <= bucket.start and bucket.end <= end:
+                result.merge(bucket)
+            elif level == LEAF:
+                first = bisect.bisect_left(bucket.times, start)
+                last = bisect.bisect_left(bucket.times, end)
+                for value in bucket.values[first:last]:
+                    result.add(value)
+            else:
+                self._aggregate(level + 1, bucket.key, start, end, result)
+
+    def buckets(self, level, start, end):
+        """Yield the buckets of a level ("year" ... "minute") overlapping
+        [start, end), in time order. Handy for charting a time series."""
+        level = LEVELS.index(level)
+        keys = self._keys[level]
+        buckets = self._buckets[level]
+        lo, hi = self._key_range(level, "", start, end)
+        for i in range(lo, hi):
+            bucket = buckets[keys[i]]
+            if bucket.end > start and bucket.start < end:
+                yield bucket
+
+    def events(self, start, end):
+        """Yield the (timestamp, value) events in [start, end), in time
+        order."""
+        for bucket in self.buckets("minute", start, end):
+            first = bisect.bisect_left(bucket.times, start)
+            last = bisect.bisect_left(bucket.times, end)
+            yield from zip(bucket.times[first:last], bucket.values[first:last])
+
+
+##
+#
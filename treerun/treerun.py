@@ -116,11 +116,13 @@
 
 
 import logging
-import argparse
 import time
 import os
+import stat
 import sys
 
+# argparse is imported in build_cmd_line_parser() rather than here, so importing this file as a module stays cheap.
+
 # Other essential core modules you may want to use early in your new application:
 # import io
 # import re
@@ -168,6 +170,12 @@ config.default_log_level = logging.INFO
 # of the log actions. You will see WARN, ERROR and CRITICAL messages in either INFO or DEBUG log_levels. We have not
 # limited the message types/levels. We have only limited the selection of log level to a single --verbose switch.
 
+# Statistics (--stats, --stats-only). At most this many distinct extensions and this many distinct owners are tracked
+# each; entries with a key beyond the limit are all counted under "(other)", so memory stays bounded on any tree.
+config.stats_max_keys = 1000
+# Number of extensions and owners, largest total size first, listed in the statistics report.
+config.stats_report_top = 25
+
 
 #################################################  CLASS DEFINITIONS  ##################################################
 
@@ -229,6 +237,7 @@ class App(Base):
         self.depth = -1  # Prior to starting traversal, such that root node is depth 0. TODO: Verify this convention.
         # TODO: Implement depth. Currently lacking the method to calculate depth.
         self.node_count = 0  # TODO: Possibly move this to a static/class attribute of the Node class.
+        self.stats = None  # TreeStats accumulator, fed by process_dir(), when --stats or --stats-only is given.
 
         self.arg = cmd_line_parser.parse_args()  # A namespace object is returned to self.arg here. See argparse docs.
 
@@ -245,6 +254,10 @@ class App(Base):
         else:
             self.log.info("Using default log level of " + logging.getLevelName(self.cfg.default_log_level))
 
+        if self.arg.stats or self.arg.stats_only:
+            self.stats = TreeStats(max_keys=self.cfg.stats_max_keys)
+            self.log.info("Statistics enabled. Tree will " + ("not " if self.arg.stats_only else "") + "be built.")
+
 
     def run(self):
         self.log.info("Application " + self.cfg.app_nick + " is now running.")
@@ -268,9 +281,14 @@ class App(Base):
         root_node = Node(path=abs_path, name="Root Node", node_type="dir", attributes=None)
 
         # Complete the tree by recursively processing the root node to add all child nodes, returning the full tree.
+        # With --stats-only, no nodes are attached to the tree and only the statistics come out of the traversal.
         self.tree = self.process_dir(root_node)
 
-    def process_dir(self, current_node):
+        if self.stats is not None:
+            self.stats.report(self.cfg.stats_report_top)
+
+    def process_dir(self, current_node, count_stats=True):
+        # count_stats is False below a symlinked directory: its files are not added to the statistics.
         Node.current_traversal_depth += 1  # Class attribute. # TODO: Should we access it like this here?
         # TODO: OR .. we could make a class method to: increase_current_traversal_depth()
         # TODO: Similarly: decrease_depth() get_max_depth()
@@ -293,19 +311,43 @@ class App(Base):
             self.log.debug("- - - - Path of current dir_item is: " + str(abs_path_dir_item))
             self.log.debug("- - - - New Node name: " + str(dir_item))
 
-            if os.path.isdir(abs_path_dir_item):
+            # One lstat() per entry gives both the type and, for statistics, the size, owner and age. Only symlinks
+            # need a second call, to keep following links to directories as os.path.isdir() does.
+            try:
+                item_stat = os.lstat(abs_path_dir_item)
+            except OSError as e:
+                self.log.warning("- - - - Cannot stat " + abs_path_dir_item + ": " + str(e))
+                continue
+            is_link = stat.S_ISLNK(item_stat.st_mode)
+            if is_link:
+                is_dir = os.path.isdir(abs_path_dir_item)
+            else:
+                is_dir = stat.S_ISDIR(item_stat.st_mode)
+
+            if is_dir:
+                # A symlinked directory points at files which are counted where they really are (when inside the tree)
+                # or are not part of the tree at all, and may even point back up the tree. Its files are left out of
+                # the statistics, and with --stats-only, where there is no tree to show them in, it is not entered.
+                if is_link and self.arg.stats_only:
+                    self.log.debug("- - - - Skipping symlinked directory: " + abs_path_dir_item)
+                    continue
                 node_type = 'dir'
                 self.log.debug("- - - - New Node is of type 'dir'")
                 new_child_node = Node(path=abs_path_dir_item, name=dir_item, node_type="dir", attributes=None)
-                current_node.add_child(new_child_node)
+                if not self.arg.stats_only:
+                    current_node.add_child(new_child_node)
                 self.log.debug("- - - - Node count: " + str(Node.count))
                 # RECURSE FURTHER
-                self.process_dir(new_child_node)
+                self.process_dir(new_child_node, count_stats and not is_link)
             else:
                 node_type = 'file'
                 self.log.debug("- - - - New Node is of type 'file'")
-                new_file_node = Node(path=abs_path_dir_item, name=dir_item, node_type="file", attributes="coming soon")
-                current_node.add_file(new_file_node)
+                if self.stats is not None and count_stats:
+                    self.stats.add(dir_item, item_stat)
+                if not self.arg.stats_only:
+                    new_file_node = Node(path=abs_path_dir_item, name=dir_item, node_type="file",
+                                         attributes="coming soon")
+                    current_node.add_file(new_file_node)
                 self.log.debug("- - - - Node count: " + str(Node.count))
                 # Files are just added to their current node with no recursion involved.
 
@@ -358,6 +400,96 @@ class Node(object):
         return len(self.files)
 
 
+class TreeStats(object):
+    """Streaming statistics of the files seen during a traversal, per extension and per owner uid: file count, total
+    bytes, a size histogram and an age histogram for each key. process_dir() calls add() once per file and nothing is
+    kept about the file itself, so memory depends only on the number of keys (capped at max_keys per kind, the rest
+    going to "(other)") and never on the number of files. This is what lets --stats-only report on trees far too big
+    for the Node tree to fit in memory, in the same single pass."""
+    OTHER = "(other)"
+    NO_EXTENSION = "(none)"
+    # Size bucket i holds sizes whose bit length is i: bucket 0 is empty files, bucket i is 2**(i-1) up to 2**i - 1
+    # bytes. The last bucket also takes everything bigger (256 TB and up).
+    SIZE_BUCKETS = 50
+    # Age buckets by modification time: upper bounds in days, then one more bucket for everything older.
+    AGE_LIMITS = [1, 7, 30, 90, 365, 3 * 365]
+    AGE_LABELS = ["<1d", "<1w", "<1m", "<3m", "<1y", "<3y", "older"]
+
+    def __init__(self, max_keys=1000, now=None):
+        self.max_keys = max_keys
+        self.now = time.time() if now is None else now
+        self.by_ext = {}  # extension -> accumulator list, see new_accumulator()
+        self.by_uid = {}  # owner uid -> accumulator list
+        self.total = self.new_accumulator()
+
+    def new_accumulator(self):
+        # [file count, total bytes, size histogram, age histogram]. A list rather than an object: one is updated per
+        # file and per key, so it should be cheap.
+        return [0, 0, [0] * self.SIZE_BUCKETS, [0] * len(self.AGE_LABELS)]
+
+    def accumulator(self, table, key):
+        acc = table.get(key)
+        if acc is None:
+            if len(table) >= self.max_keys:
+                key = self.OTHER
+                acc = table.get(key)
+            if acc is None:
+                acc = table[key] = self.new_accumulator()
+        return acc
+
+    def add(self, name, file_stat):
+        size = file_stat.st_size
+        size_bucket = min(size.bit_length(), self.SIZE_BUCKETS - 1)
+        age_days = (self.now - file_stat.st_mtime) / 86400.0
+        age_bucket = 0
+        for limit in self.AGE_LIMITS:
+            if age_days < limit:
+                break
+            age_bucket += 1
+        ext = os.path.splitext(name)[1].lower() or self.NO_EXTENSION
+        for acc in (self.total, self.accumulator(self.by_ext, ext), self.accumulator(self.by_uid, file_stat.st_uid)):
+            acc[0] += 1
+            acc[1] += size
+            acc[2][size_bucket] += 1
+            acc[3][age_bucket] += 1
+
+    @staticmethod
+    def format_bytes(size):
+        for unit in ("B", "K", "M", "G", "T"):
+            if size < 1024 or unit == "T":
+                break
+            size /= 1024.0
+        return ("%d%s" if unit == "B" else "%.1f%s") % (size, unit)
+
+    def format_histograms(self, acc):
+        # Only the non-empty buckets, each labeled with its upper bound.
+        sizes = " ".join("%s:%d" % ("0" if i == 0 else "<" + self.format_bytes(2 ** i), count)
+                         for i, count in enumerate(acc[2]) if count)
+        ages = " ".join("%s:%d" % (label, count) for label, count in zip(self.AGE_LABELS, acc[3]) if count)
+        return "size " + sizes + "  age " + ages
+
+    @staticmethod
+    def owner_name(uid):
+        if uid == TreeStats.OTHER:
+            return uid
+        try:
+            import pwd  # Unix only.
+            return "%s (%d)" % (pwd.getpwuid(uid).pw_name, uid)
+        except (ImportError, KeyError):
+            return str(uid)
+
+    def report(self, top=25, out=None):
+        out = out or sys.stdout
+        out.write("Files: %d  Bytes: %s\n" % (self.total[0], self.format_bytes(self.total[1])))
+        out.write("    " + self.format_histograms(self.total) + "\n")
+        for title, table, label in (("extension", self.by_ext, str), ("owner", self.by_uid, self.owner_name)):
+            out.write("\nBy %s (%d, largest first):\n" % (title, len(table)))
+            for key, acc in sorted(table.items(), key=lambda item: -item[1][1])[:top]:
+                share = 100.0 * acc[1] / self.total[1] if self.total[1] else 0.0
+                out.write("  %-24s %10d files %10s %5.1f%%\n" % (label(key), acc[0], self.format_bytes(acc[1]), share))
+                out.write("    " + self.format_histograms(acc) + "\n")
+
+
 ########################################################  MAIN  ########################################################
 
 
@@ -367,8 +499,8 @@ def main():
     Specific non-zero values will depend on your application, your environment and how you choose to implement such
     conventions, perform error trapping, etc. 0 for success is mandatory. Non-zero values are up to you. main()
     initializes the global logger and starts this application with App.run(). When the program is almost done operating,
-    the last part of main() can then perform any finalization and cleanup prior to exit. This application does not
-    currently support importing as a module, although it could with some minimal changes."""
+    the last part of main() can then perform any finalization and cleanup prior to exit. Importing this file as a module
+    does not call main(), so its classes and functions can be reused by other programs, tests and benchmarks."""
 
     root_logger_name = config.app_nick + "-main"
 
@@ -384,13 +516,13 @@ def main():
     logger.info("- - - - - - - - - - Initializing " + config.app_nick + " " + start_time_human)
     logger.info("Instantiated root logger: " + root_logger_name)
 
-    app = App(config, logger, cmd_line_parser)
+    app = App(config, logger, build_cmd_line_parser())
     app.run()
 
     return 0
 
 
-################################################  MAIN EXECUTION BEGINS  ###############################################
+#############################################  COMMAND-LINE OPTIONS  ###################################################
 
 
 #### ARGPARSE COMMAND-LINE OPTIONS AND HELP CONFIGURATION ####
@@ -423,26 +555,26 @@ def main():
 # Read below about full-width-wrapping vs. fixed-formatting limited to 80 chars.
 ################################################################################
 
-cmd_line_parser = argparse.ArgumentParser(
-    description="""This is the program description shown when the --help or -h command-line options are invoked."""
-                """Notice how triple-double quotes are used here and also notice how the first part of this """
-                """description has opening and closing quotes on each line with included space characters after """
-                """the last word on each line. The lower part of this description needs to use fixed-formatting """
-                """because we are using indentation and blank lines to highlight some important commands for our """
-                """program. It is this fixed-formatting part at the end which requires us to use triple-double """
-                """quotes in this manner for the entire description. Since we don't need the fixed-formatting """
-                """for the first part of the description and we do want the lines to wrap, that is why we also have """
-                """closing quotes up here. In the lower part, we must continue using the same kind of quotes """
-                """because this entire description is a single attribute and we cannot mix quote types here. """
-                """If you do not need any fancy fixed-formatting in your description then you can simplify the """
-                """quoting, but helping the reader with formatting and thorough help text can be worth the """
-                """effort. The triple quotes mean we do not have to escape apostrophes or newlines and it also """
-                """means we can easily read and edit our own fixed formatting here in the code itself. So this part """
-                """of the description text will wrap at the full console width where it is displayed, but the below """
-                """fixed-formatting part we will hard-wrap at no more than 80 characters. The PEP8 coding standards """
-                """being followed in this python code means our code line width is no more than 120 characters, but """
-                """the maximum width of fixed-formatted help text should not exceed 80 characters and this is the """
-                """standard you will see in most if not all unix/linux command help displayed in a console.
+CMD_LINE_DESCRIPTION = (
+    """This is the program description shown when the --help or -h command-line options are invoked."""
+    """Notice how triple-double quotes are used here and also notice how the first part of this """
+    """description has opening and closing quotes on each line with included space characters after """
+    """the last word on each line. The lower part of this description needs to use fixed-formatting """
+    """because we are using indentation and blank lines to highlight some important commands for our """
+    """program. It is this fixed-formatting part at the end which requires us to use triple-double """
+    """quotes in this manner for the entire description. Since we don't need the fixed-formatting """
+    """for the first part of the description and we do want the lines to wrap, that is why we also have """
+    """closing quotes up here. In the lower part, we must continue using the same kind of quotes """
+    """because this entire description is a single attribute and we cannot mix quote types here. """
+    """If you do not need any fancy fixed-formatting in your description then you can simplify the """
+    """quoting, but helping the reader with formatting and thorough help text can be worth the """
+    """effort. The triple quotes mean we do not have to escape apostrophes or newlines and it also """
+    """means we can easily read and edit our own fixed formatting here in the code itself. So this part """
+    """of the description text will wrap at the full console width where it is displayed, but the below """
+    """fixed-formatting part we will hard-wrap at no more than 80 characters. The PEP8 coding standards """
+    """being followed in this python code means our code line width is no more than 120 characters, but """
+    """the maximum width of fixed-formatted help text should not exceed 80 characters and this is the """
+    """standard you will see in most if not all unix/linux command help displayed in a console.
 
             Now we are in the section which drives the use of the triple-quotes.
             Note that an 80-character-line ends -------------here------------->|
@@ -483,29 +615,61 @@ cmd_line_parser = argparse.ArgumentParser(
                 save = Save all doo-dads.
 
                 dump = Serialize all widgets into separate xml files.
-            """,
-    formatter_class=argparse.RawDescriptionHelpFormatter,
-    add_help=True)
-
-cmd_line_parser.add_argument(
-    '--verbose',
-    action='store_true',
-    help='Include a high level of detail in the log and in any output to the user. This option changes the log level'
-         ' from INFO to DEBUG. The specific types of information which will be added and whether it is added just to'
-         ' the log or also to user output will depend on the application. Customize this text to your application.')
-
-cmd_line_parser.add_argument(
-    '--path',
-    action='store',
-    help='Path at which to begin the traversal of the filesystem. This must be a directory. This requirement could be'
-         ' lifted if this program would process any node, file or directory, even a single file as the root. It is'
-         ' an arbitrary convention to require this as a directory, applied because the focus of this app is traversal.'
-         ' String representing a valid path to a directory on the current filesystem.')
-
-# Command-line parsing has now been configured and we can start initializing and then running the application.
-
-status = main()  # Start program execution.
-exit(status)  # Program execution ends, returning the integer returned by main to the shell as the process exit status.
+            """)
+
+
+def build_cmd_line_parser():
+    """Builds and returns the argparse parser for the command-line options. This is called by main() only when the
+    program is actually run, not when this file is imported as a module. Keeping the parser construction (and the
+    import of argparse) out of import time means importing is cheap and a run only pays for what it really uses."""
+    import argparse  # Imported here rather than at the top of the file. See PYTHON CORE LIBRARIES above.
+
+    cmd_line_parser = argparse.ArgumentParser(
+        description=CMD_LINE_DESCRIPTION,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        add_help=True)
+
+    cmd_line_parser.add_argument(
+        '--verbose',
+        action='store_true',
+        help='Include a high level of detail in the log and in any output to the user. This option changes the log'
+             ' level from INFO to DEBUG. The specific types of information which will be added and whether it is added'
+             ' just to the log or also to user output will depend on the application. Customize this text to your'
+             ' application.')
+
+    cmd_line_parser.add_argument(
+        '--path',
+        action='store',
+        help='Path at which to begin the traversal of the filesystem. This must be a directory. This requirement could'
+             ' be lifted if this program would process any node, file or directory, even a single file as the root. It'
+             ' is an arbitrary convention to require this as a directory, applied because the focus of this app is'
+             ' traversal. String representing a valid path to a directory on the current filesystem.')
+
+    cmd_line_parser.add_argument(
+        '--stats',
+        action='store_true',
+        help='After the traversal, print statistics of the files per extension and per owner: file count, total bytes,'
+             ' a size histogram (power-of-two buckets) and an age histogram (by modification time). The statistics are'
+             ' gathered during the same single traversal which builds the tree. Files under a symlinked directory are'
+             ' shown in the tree but not counted, so that no file is counted twice.')
+
+    cmd_line_parser.add_argument(
+        '--stats-only',
+        action='store_true',
+        help='Like --stats, but do not build the tree. Memory use then stays small and constant however many files'
+             ' there are, so this works on trees too big for the tree to fit in memory. Symlinked directories are not'
+             ' entered.')
+
+    # Command-line parsing has now been configured and we can start initializing and then running the application.
+    return cmd_line_parser
+
+
+################################################  MAIN EXECUTION BEGINS  ###############################################
+
+
+# main() is only called when this file is run as a program, never when it is imported as a module.
+if __name__ == '__main__':
+    sys.exit(main())  # Returns the integer returned by main to the shell as the process exit status.
 
 
 ##
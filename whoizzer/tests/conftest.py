@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The whoizzer modules live next to this directory; make them importable
+# however pytest is run (from the repository root or from whoizzer/).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
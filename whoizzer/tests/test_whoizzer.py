@@ -0,0 +1,53 @@
+import asyncio
+import io
+import os
+import stat
+import tempfile
+import unittest
+
+import whoiscache
+import whoizzer
+
+# Stands in for whois: answers according to the name it is asked about.
+STUB_WHOIS = """#!/bin/sh
+case "$1" in
+  taken.com) printf 'Domain Name: TAKEN.COM\\nRegistrar: Example Registrar, Inc.\\nCreation Date: 2001-02-03\\n' ;;
+  free.com) printf 'No match for "FREE.COM".\\n' ;;
+  limited.com) printf 'WHOIS LIMIT EXCEEDED - SEE WWW.PIR.ORG/WHOIS FOR DETAILS\\n' ;;
+  broken.com) exit 1 ;;
+esac
+"""
+
+
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.command = os.path.join(directory.name, "whois")
+        with open(self.command, "w") as f:
+            f.write(STUB_WHOIS)
+        os.chmod(self.command, stat.S_IRWXU)
+        self.cache = whoiscache.WhoisCache(":memory:")
+        self.addCleanup(self.cache.close)
+
+    def run_batch(self, names):
+        out = io.StringIO()
+        counts = asyncio.run(whoizzer.run_batch(names, self.command, concurrency=4, rate=0, timeout=5,
+                                                retries=0, cache=self.cache, out=out))
+        statuses = dict(line.split("\t")[:2] for line in out.getvalue().splitlines())
+        return counts, statuses
+
+    def test_unrecognised_answers_are_errors_and_not_cached(self):
+        counts, statuses = self.run_batch(["taken.com", "free.com", "limited.com", "broken.com"])
+        self.assertEqual(statuses, {"taken.com": "registered", "free.com": "available",
+                                    "limited.com": "error", "broken.com": "error"})
+        self.assertEqual(counts, {"registered": 1, "available": 1, "error": 2})
+        self.assertIsNotNone(self.cache.get("taken.com"))
+        self.assertIsNotNone(self.cache.get("free.com"))
+        self.assertIsNone(self.cache.get("limited.com"))
+        self.assertIsNone(self.cache.get("broken.com"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+#! /usr/bin/env python3
+
+# Local cache of parsed whois results, in SQLite.
+#
+# Only the extracted record is stored, not the raw whois text. Answers
+# expire after a TTL which depends on the answer: a registered domain
+# rarely changes hands, while an available one may be registered any day,
+# so "No match" answers are kept for a shorter time. Failed lookups are
+# not cached.
+
+import os
+import sqlite3
+import time
+
+CACHE_PATH = os.path.expanduser("~/.cache/whoizzer/cache.db")
+REGISTERED_TTL = 7 * 24 * 3600  # Seconds.
+AVAILABLE_TTL = 24 * 3600
+COMMIT_EVERY = 100  # Writes between commits.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    name TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    domain TEXT,
+    registrar TEXT,
+    created TEXT,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class WhoisCache:
+
+    def __init__(self, path=CACHE_PATH, registered_ttl=REGISTERED_TTL, available_ttl=AVAILABLE_TTL):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.ttl = {'registered': registered_ttl, 'available': available_ttl}
+        self.pending = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name):
+        # The cached (status, domain, registrar, created) of name, or None
+        # if there is none or it has expired.
+        row = self.conn.execute(
+            "SELECT status, domain, registrar, created FROM results WHERE name = ? AND expires_at > ?",
+            (name, time.time())).fetchone()
+        if row is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return row
+
+    def put(self, name, status, domain, registrar, created):
+        ttl = self.ttl.get(status)
+        if not ttl:
+            return
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO results (name, status, domain, registrar, created, fetched_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (name, status, domain, registrar, created, now, now + ttl))
+        self.pending += 1
+        if self.pending >= COMMIT_EVERY:
+            self.commit()
+
+    def commit(self):
+        self.conn.commit()
+        self.pending = 0
+
+    def purge(self):
+        # Drop expired results; returns how many.
+        deleted = self.conn.execute("DELETE FROM results WHERE expires_at <= ?", (time.time(),)).rowcount
+        self.commit()
+        return deleted
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+##
+#
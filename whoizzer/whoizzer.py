@@ -1,37 +1,280 @@
 #! /usr/bin/env python3
 
-import sys
+# Look up one domain:
+#   ./whoizzer.py example          (.com is added when there is no dot)
+#
+# Or many, concurrently, one name per line from a file or stdin:
+#   ./whoizzer.py --batch names.txt
+#   ./whoizzer.py --batch - < names.txt
+# Batch results are printed as each lookup finishes, one tab-separated
+# line per name: name, status (registered, available or error), registrar,
+# creation date; or, with --json, one JSON object per line.
+#
+# Results are cached in a local SQLite database (see whoiscache.py), so
+# repeated lookups of the same names do not run whois again until the
+# cached answer expires.
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import shlex
+import signal
 import subprocess
+import sys
+import time
+from collections import namedtuple
+
+import whoiscache
 
 #COMMAND_WITH_OPTIONS = '/usr/bin/whois'
 COMMAND_WITH_OPTIONS = 'whois'
 
-arg = sys.argv[1]
+# Batch mode defaults, all can be changed on the command line.
+CONCURRENCY = 20  # whois processes running at once, at most.
+RATE = 10.0  # Lookups started per second per registry (TLD), at most.
+TIMEOUT = 20.0  # Seconds before a whois process is killed.
+RETRIES = 2  # Further attempts after a timeout or failure.
+BACKOFF = 2.0  # Seconds before the first retry, doubled for each next one.
+
+
+def full_name(arg):
+    arg = arg.strip()
+    if '.' not in arg:
+        arg = f"{arg}.com"
+    return arg
+
+
+# A whois answer reduced to what we look at. status is 'registered',
+# 'available' or 'error'; the other fields are '' when not found.
+Record = namedtuple('Record', 'name status domain registrar created')
+
+# One pass over the whois text finds every line of interest. The labels
+# differ between registries; the first value found for each field wins
+# (thin registries such as .com print the registry's answer first).
+FIELD_RE = re.compile(
+    r"^[ \t]*(?:"
+    r"(?P<domain>Domain Name|domain):[ \t]*(?P<domain_value>\S*)"
+    r"|(?P<registrar>Registrar|Sponsoring Registrar|registrar):[ \t]*(?P<registrar_value>[^\r\n]*?)"
+    r"|(?P<created>Creation Date|Created On|created|Registered on):[ \t]*(?P<created_value>[^\r\n]*?)"
+    r"|(?P<available>No match for|NOT FOUND|No Data Found|No entries found|Domain not found|Status:[ \t]*free)[^\r\n]*?"
+    r")[ \t]*\r?$",
+    re.MULTILINE)
+
+
+def extract(name, res_string):
+    fields = {}
+    available = False
+    for match in FIELD_RE.finditer(res_string):
+        kind = match.lastgroup
+        if kind == 'available':
+            available = True
+        else:
+            # lastgroup is the value group; its field name is the label group.
+            field = kind[:-len('_value')]
+            if field not in fields and match.group(kind):
+                fields[field] = match.group(kind).strip()
+    if available and 'registrar' not in fields:
+        status = 'available'
+    elif fields.get('domain') or fields.get('registrar'):
+        status = 'registered'
+    else:
+        # Neither a no-match line nor a domain or registrar: an empty
+        # answer, a rate limit notice, an error message from the server.
+        return Record(name, 'error', '', "no domain, registrar or no-match line in the answer", '')
+    return Record(name, status, fields.get('domain', ''), fields.get('registrar', ''), fields.get('created', ''))
+
+
+def lookup(name, command=COMMAND_WITH_OPTIONS):
+    # Returns (output, error) like lookup_async(), without the retries.
+    # No shell: the name is passed as a single argument, whatever it contains.
+    try:
+        res = subprocess.run(shlex.split(command) + [name], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except OSError as e:
+        return '', str(e)
+    if not res.stdout.strip():
+        return '', f"exit status {res.returncode}, no output"
+    return res.stdout.decode("utf-8", "replace"), None
+
+
+class RateLimiter:
+    # Spaces out the starts of lookups to the same registry, approximated
+    # by the TLD, so that no whois server sees more than `rate` queries per
+    # second from us.
 
-if '.' not in arg:
-    arg = f"{arg}.com"
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_start = {}  # TLD -> earliest monotonic time of the next start
 
-cmd = f"{COMMAND_WITH_OPTIONS} {arg}"
+    async def wait(self, name):
+        if not self.interval:
+            return
+        tld = name.rsplit('.', 1)[-1].lower()
+        now = time.monotonic()
+        start = max(now, self.next_start.get(tld, now))
+        # Reserve the slot before sleeping, so concurrent callers queue up.
+        self.next_start[tld] = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
 
-res = subprocess.check_output(cmd, stderr=None, shell=True)
 
-res_string = res.decode("utf-8")  # Weird but a bytearray is returned
-res_arr = res_string.split("\n")  # Makes a list of the lines
+async def lookup_async(name, command, limiter, timeout, retries):
+    # Returns (output, error); error is None on success.
+    error = None
+    for attempt in range(retries + 1):
+        if attempt:
+            await asyncio.sleep(BACKOFF * 2 ** (attempt - 1))
+        await limiter.wait(name)
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *shlex.split(command), name,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+                start_new_session=True)
+        except OSError as e:
+            return '', str(e)  # No whois command: retrying will not help.
+        try:
+            stdout, _ = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            # Kill the whole process group: a child left holding the output
+            # pipe would keep wait() from returning.
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+            error = f"timeout after {timeout:g}s"
+            continue
+        # whois exits non-zero for some unregistered names; any output is an answer.
+        if stdout.strip():
+            return stdout.decode("utf-8", "replace"), None
+        error = f"exit status {proc.returncode}, no output"
+    return '', error
 
-print()
-for line in res_arr:
-    if r'Domain Name: ' in line:
-        print(line)
-    if r'Registrar: ' in line:
-        print(line)
-    if r'Creation Date: ' in line:
-        print(line)
-    if r'No match for domain' in line:
-        #print(line)
+
+def format_record(record, as_json=False):
+    # For an error, the registrar field holds the error message.
+    if as_json:
+        return json.dumps(record._asdict())
+    return f"{record.name}\t{record.status}\t{record.registrar}\t{record.created}"
+
+
+async def run_batch(names, command, concurrency, rate, timeout, retries, cache=None, as_json=False,
+                    out=sys.stdout):
+    # A fixed set of worker tasks take names from a queue, so memory does
+    # not grow with the number of names; each result is written as soon as
+    # its lookup finishes. Cached names are answered without a lookup (and
+    # without waiting for the rate limit).
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    limiter = RateLimiter(rate)
+    counts = {'registered': 0, 'available': 0, 'error': 0}
+
+    async def worker():
+        while True:
+            name = await queue.get()
+            if name is None:
+                return
+            cached = cache.get(name) if cache is not None else None
+            if cached is not None:
+                record = Record(name, *cached)
+            else:
+                output, error = await lookup_async(name, command, limiter, timeout, retries)
+                if error is not None:
+                    record = Record(name, 'error', '', error, '')
+                else:
+                    record = extract(name, output)
+                # Errors are not cached: the next run tries again.
+                if cache is not None and record.status != 'error':
+                    cache.put(*record)
+            counts[record.status] += 1
+            out.write(format_record(record, as_json) + '\n')
+            out.flush()
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    for name in names:
+        await queue.put(name)
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+    return counts
+
+
+def read_names(source):
+    # Names from a file (or stdin for '-'), one per line, blank lines and
+    # '#' comments skipped, read lazily.
+    f = sys.stdin if source == '-' else open(source)
+    try:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                yield full_name(line)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up domain names with whois.")
+    parser.add_argument('name', nargs='?', help="domain to look up (.com is added when there is no dot)")
+    parser.add_argument('--batch', metavar='FILE', help="look up every name in FILE ('-' for stdin)")
+    parser.add_argument('--whois-cmd', default=COMMAND_WITH_OPTIONS, help="whois command and options")
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help="lookups running at once")
+    parser.add_argument('--rate', type=float, default=RATE,
+                        help="lookups started per second per TLD (0 for no limit)")
+    parser.add_argument('--timeout', type=float, default=TIMEOUT, help="seconds per whois attempt")
+    parser.add_argument('--retries', type=int, default=RETRIES, help="further attempts after a failure")
+    parser.add_argument('--json', action='store_true', help="print batch results as JSON lines")
+    parser.add_argument('--cache', default=whoiscache.CACHE_PATH, help="result cache database")
+    parser.add_argument('--no-cache', action='store_true', help="neither read nor write the result cache")
+    args = parser.parse_args()
+
+    if not args.batch and not args.name:
+        parser.error("a name or --batch is required")
+
+    cache = None if args.no_cache else whoiscache.WhoisCache(args.cache)
+    try:
+        if args.batch:
+            start = time.monotonic()
+            counts = asyncio.run(run_batch(read_names(args.batch), args.whois_cmd, max(1, args.concurrency),
+                                           args.rate, args.timeout, args.retries, cache, args.json))
+            print(f"# {sum(counts.values())} names in {time.monotonic() - start:.1f}s: "
+                  f"{counts['registered']} registered, {counts['available']} available, {counts['error']} errors"
+                  + (f", {cache.hits} from cache" if cache is not None else ""),
+                  file=sys.stderr)
+            return 1 if counts['error'] else 0
+
+        name = full_name(args.name)
+        cached = cache.get(name) if cache is not None else None
+        if cached is not None:
+            record = Record(name, *cached)
+        else:
+            output, error = lookup(name, args.whois_cmd)
+            record = Record(name, 'error', '', error, '') if error is not None else extract(name, output)
+            if cache is not None and record.status != 'error':
+                cache.put(*record)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    if record.status == 'error':
+        print(f"{name}: lookup failed: {record.registrar}", file=sys.stderr)
+        return 1
+
+    print()
+    if record.domain:
+        print(f"Domain Name: {record.domain}")
+    if record.registrar:
+        print(f"Registrar: {record.registrar}")
+    if record.created:
+        print(f"Creation Date: {record.created}")
+    if record.status == 'available':
         print('* * * * AVAILABLE * * * *')
+    print()
+    return 0
 
-print()
+
+if __name__ == '__main__':
+    sys.exit(main())
 
 ##
 #
-